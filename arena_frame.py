@@ -0,0 +1,89 @@
+import collections
+import threading
+
+from PIL import Image, ImageDraw
+
+
+class ArenaFrame:
+    """Compositor for the arena-mode neon border with pixelated corners
+
+    The border and its corner pattern depend only on the size of the framed image, so
+    they are drawn once per size and kept in an LRU. Framing an image is then a copy of
+    the cached canvas and a single paste. Use for_border() to share one compositor per
+    border size between the carousels.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, border_size, border_color="#00FF00", corner_color="#000000", max_sizes=16):
+        self.border_size = border_size
+        self.border_color = border_color
+        self.corner_color = corner_color
+        self.max_sizes = max_sizes
+        self._canvases = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_border(cls, border_size):
+        """Return the shared compositor for a border size"""
+        with cls._shared_lock:
+            if border_size not in cls._shared:
+                cls._shared[border_size] = cls(border_size)
+            return cls._shared[border_size]
+
+    def compose(self, image):
+        """Return image framed in the arena border"""
+        frame = self._canvas(image.size).copy()
+        frame.paste(image, (self.border_size, self.border_size))
+        return frame
+
+    def _canvas(self, size):
+        """Return the cached border canvas for an image of the given size"""
+        with self._lock:
+            canvas = self._canvases.get(size)
+            if canvas is not None:
+                self._canvases.move_to_end(size)
+                return canvas
+
+        canvas = self._draw(size)
+        with self._lock:
+            self._canvases[size] = canvas
+            while len(self._canvases) > self.max_sizes:
+                self._canvases.popitem(last=False)
+        return canvas
+
+    def _draw(self, size):
+        border_size = self.border_size
+        half = border_size // 2
+        border, corner = self.border_color, self.corner_color
+
+        canvas = Image.new('RGB', (size[0] + 2*border_size, size[1] + 2*border_size), border)
+        width, height = canvas.size
+        draw = ImageDraw.Draw(canvas)
+
+        # Top-left corner
+        draw.rectangle((0, 0, half, half), fill=corner)
+        draw.rectangle((half, 0, border_size, half), fill=border)
+        draw.rectangle((0, half, half, border_size), fill=border)
+
+        # Top-right corner
+        tr_x = width - border_size
+        draw.rectangle((tr_x, 0, tr_x + half, half), fill=border)
+        draw.rectangle((tr_x + half, 0, width, half), fill=corner)
+        draw.rectangle((tr_x + half, half, width, border_size), fill=border)
+
+        # Bottom-left corner
+        bl_y = height - border_size
+        draw.rectangle((0, bl_y, half, bl_y + half), fill=border)
+        draw.rectangle((0, bl_y + half, half, height), fill=corner)
+        draw.rectangle((half, bl_y + half, border_size, height), fill=border)
+
+        # Bottom-right corner
+        br_x = width - border_size
+        br_y = height - border_size
+        draw.rectangle((br_x, br_y, br_x + half, br_y + half), fill=border)
+        draw.rectangle((br_x + half, br_y, width, br_y + half), fill=border)
+        draw.rectangle((br_x + half, br_y + half, width, height), fill=corner)
+
+        return canvas
@@ -0,0 +1,302 @@
+"""Headless batch generation from a JSONL job file
+
+Each line of the job file is a JSON object such as:
+
+    {"job_id": "nyc-1", "prompt": "Starry Night in NYC", "models": ["Flux Schnell", "google/imagen-3"],
+     "images_per_model": 2, "params": {"aspect_ratio": "16:9"}}
+
+Models may be given by their UI name or by Replicate model ID. For every finished job
+one line is appended to the status file with its state and the saved images. Jobs whose
+ID already has a "done" line in the status file are skipped, so an interrupted run can
+simply be started again.
+
+Usage:
+    python batch_cli.py jobs.jsonl --status status.jsonl --concurrency 4
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+import database
+from generation_engine import AVAILABLE_MODELS, GenerationEngine, GenerationJob
+from latency_store import LatencyStore
+from rate_limiter import ConcurrencyLimiter
+from result_cache import ResultCache
+
+
+SETTINGS_DIR = os.path.join(os.path.expanduser('~'), '.imagegenie')
+
+
+def log(message):
+    """Print a timestamped message to stderr"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", file=sys.stderr, flush=True)
+
+
+def load_settings():
+    """Load the desktop app's settings file if there is one"""
+    settings_file = os.path.join(SETTINGS_DIR, 'settings.json')
+    try:
+        if os.path.exists(settings_file):
+            with open(settings_file, 'r') as f:
+                return json.load(f)
+    except Exception as e:
+        log(f"Error loading settings: {str(e)}")
+    return {}
+
+
+def read_finished_job_ids(status_path):
+    """Return the IDs of jobs already marked done in the status file"""
+    finished = set()
+    if not os.path.exists(status_path):
+        return finished
+
+    with open(status_path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash, the job will simply run again
+                continue
+            if record.get('state') == 'done':
+                finished.add(record.get('job_id'))
+    return finished
+
+
+def iter_jobs(jobs_path):
+    """Yield (line_number, job) for each job in the file without reading it all at once"""
+    with open(jobs_path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                log(f"Skipping line {line_number}: invalid JSON ({str(e)})")
+                continue
+            if not isinstance(job, dict):
+                log(f"Skipping line {line_number}: not a JSON object")
+                continue
+            yield line_number, job
+
+
+def resolve_model(model):
+    """Return (name, model_id) for a UI model name or a Replicate model ID"""
+    if model in AVAILABLE_MODELS:
+        return model, AVAILABLE_MODELS[model]
+    if "/" in model:
+        return model.split(":")[0].split("/")[-1], model
+    raise ValueError(f"Unknown model: {model}")
+
+
+class BatchRunner:
+    """Feeds jobs from a JSONL file through the generation engine"""
+
+    def __init__(self, engine, status_path, concurrency=4, timeout=180, use_cache=False, hedge=False):
+        self.engine = engine
+        self.status_path = status_path
+        self.timeout = timeout
+        self.use_cache = use_cache
+        self.hedge = hedge
+
+        # Limits how many file jobs are in flight; the engine limits predictions per provider
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._status_lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._running = 0
+        self.counts = {'done': 0, 'partial': 0, 'failed': 0, 'skipped': 0}
+
+    def run(self, jobs_path):
+        """Run every unfinished job in the file and wait for them to finish"""
+        finished = read_finished_job_ids(self.status_path)
+
+        for line_number, spec in iter_jobs(jobs_path):
+            job_id = str(spec.get('job_id') or f"line-{line_number}")
+            if job_id in finished:
+                self.counts['skipped'] += 1
+                continue
+
+            try:
+                prediction_jobs = self._build_jobs(job_id, spec)
+            except (KeyError, TypeError, ValueError) as e:
+                log(f"Job {job_id} is invalid: {str(e)}")
+                self._write_status(job_id, 'failed', [], error=str(e))
+                continue
+
+            self._slots.acquire()
+            with self._idle:
+                self._running += 1
+            self._submit(job_id, prediction_jobs)
+
+        with self._idle:
+            self._idle.wait_for(lambda: self._running == 0)
+
+        return self.counts
+
+    def _build_jobs(self, job_id, spec):
+        prompt = spec['prompt']
+        if not isinstance(prompt, str):
+            raise TypeError("prompt must be a string")
+        prompt = prompt.strip()
+        if not prompt:
+            raise ValueError("empty prompt")
+
+        models = spec.get('models') or [next(iter(AVAILABLE_MODELS))]
+        images_per_model = int(spec.get('images_per_model', 1))
+        if images_per_model < 1:
+            raise ValueError("images_per_model must be at least 1")
+        params = spec.get('params') or {}
+        timeout = spec.get('timeout', self.timeout)
+
+        jobs = []
+        for model in models:
+            model_name, model_id = resolve_model(model)
+            for image_idx in range(images_per_model):
+                generation_name = model_name
+                if images_per_model > 1:
+                    generation_name = f"{model_name} (Image {image_idx + 1})"
+                jobs.append(GenerationJob(
+                    prompt,
+                    model_id,
+                    generation_name,
+                    timeout=timeout,
+                    input=params,
+                    hedge=self.hedge,
+                    use_cache=self.use_cache,
+                    variant=image_idx
+                ))
+        # A job without predictions would never finish and hold its slot forever
+        if not jobs:
+            raise ValueError("no images to generate")
+        return jobs
+
+    def _submit(self, job_id, prediction_jobs):
+        remaining = [len(prediction_jobs)]
+        lock = threading.Lock()
+
+        def on_done(job):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._finish(job_id, prediction_jobs)
+
+        log(f"Starting job {job_id} with {len(prediction_jobs)} image(s)")
+        for job in prediction_jobs:
+            self.engine.submit(job, on_done=on_done)
+
+    def _finish(self, job_id, prediction_jobs):
+        results = [{
+            'model': job.generation_name,
+            'model_id': job.model_id,
+            'status': job.status,
+            'filepath': job.filepath,
+            'prediction_id': job.prediction_id,
+            'cached': job.cached,
+            'error': job.error
+        } for job in prediction_jobs]
+
+        succeeded = sum(1 for job in prediction_jobs if job.filepath)
+        if succeeded == len(prediction_jobs):
+            state = 'done'
+        elif succeeded:
+            state = 'partial'
+        else:
+            state = 'failed'
+
+        self._write_status(job_id, state, results)
+        log(f"Job {job_id} {state}: {succeeded}/{len(prediction_jobs)} images")
+
+        with self._idle:
+            self._running -= 1
+            self._idle.notify_all()
+        self._slots.release()
+
+    def _write_status(self, job_id, state, results, error=None):
+        record = {
+            'job_id': job_id,
+            'state': state,
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'results': results
+        }
+        if error:
+            record['error'] = error
+
+        with self._status_lock:
+            self.counts[state] += 1
+            with open(self.status_path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate images headlessly from a JSONL job file")
+    parser.add_argument('jobs', help="JSONL file with one job per line")
+    parser.add_argument('--status', help="JSONL file to append job results to (default: <jobs>.status.jsonl)")
+    parser.add_argument('--concurrency', type=int, default=4, help="jobs to run at the same time (default: 4)")
+    parser.add_argument('--timeout', type=int, default=180, help="maximum seconds per prediction (default: 180)")
+    parser.add_argument('--output-dir', default="generated_images", help="where to save images")
+    parser.add_argument('--use-cache', action='store_true', help="reuse cached results for identical requests")
+    parser.add_argument('--hedge', action='store_true', help="hedge predictions slower than their usual p90")
+    parser.add_argument('--quiet', action='store_true', help="only log job results")
+    args = parser.parse_args(argv)
+
+    settings = load_settings()
+    api_token = os.environ.get("REPLICATE_API_TOKEN") or settings.get('api_token')
+    if not api_token:
+        log("Set REPLICATE_API_TOKEN or save a token in the desktop app first")
+        return 2
+    os.environ["REPLICATE_API_TOKEN"] = api_token
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    os.makedirs(SETTINGS_DIR, exist_ok=True)
+    db_path = os.path.join(SETTINGS_DIR, 'rankings.db')
+
+    try:
+        latency_store = LatencyStore(db_path)
+        result_cache = ResultCache.from_settings(db_path, settings)
+    except sqlite3.Error as e:
+        log(f"Database error, running without latency history and result cache: {str(e)}")
+        latency_store = None
+        result_cache = None
+
+    # Only the files are needed, so outputs are never decoded into memory
+    engine = GenerationEngine(
+        args.output_dir,
+        limiter=ConcurrencyLimiter.from_settings(settings),
+        latency_store=latency_store,
+        result_cache=result_cache,
+        decode_images=False,
+        log=(lambda message: None) if args.quiet else log
+    )
+
+    runner = BatchRunner(
+        engine,
+        args.status or os.path.splitext(args.jobs)[0] + ".status.jsonl",
+        concurrency=max(1, args.concurrency),
+        timeout=args.timeout,
+        use_cache=args.use_cache,
+        hedge=args.hedge
+    )
+
+    try:
+        counts = runner.run(args.jobs)
+    except KeyboardInterrupt:
+        log("Interrupted, canceling running predictions")
+        return 130
+    finally:
+        engine.shutdown()
+        database.close_all()
+
+    log(f"Finished: {counts['done']} done, {counts['partial']} partial, "
+        f"{counts['failed']} failed, {counts['skipped']} already done")
+    return 0 if not counts['partial'] and not counts['failed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,105 @@
+import collections
+import threading
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk, ImageDraw
+from PIL import Image
+
+from render_cache import FrameRequest, RenderCache
+
+
+class CarouselItem:
+    """One image in a carousel
+
+    Only the file path, model name and pixel size are kept here; decoded pixels live in
+    a PreviewCache so a long session does not keep every full-resolution image alive.
+    """
+
+    __slots__ = ("filepath", "model_name", "size")
+
+    def __init__(self, filepath, model_name, size):
+        self.filepath = filepath
+        self.model_name = model_name
+        self.size = size
+
+    @classmethod
+    def from_image(cls, image, model_name, filepath):
+        """Make an item for a decoded image, taking the size from the file header when possible"""
+        try:
+            with Image.open(filepath) as f:
+                size = f.size
+        except OSError:
+            size = image.size
+        return cls(filepath, model_name, size)
+
+
+class PreviewCache:
+    """Memory-budgeted LRU of display-size image previews keyed by file path
+
+    Previews are scaled down to fit within max_size, which is large enough for any
+    window on the screen. The least recently used previews are dropped once they take
+    more than budget bytes, and are decoded again from disk when next shown.
+    """
+
+    def __init__(self, max_size=(1920, 1080), budget=64 * 1024 * 1024, image_workers=None):
+        self.max_size = max_size
+        self.budget = budget
+        self.image_workers = image_workers
+        self._previews = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cost(image):
+        return image.width * image.height * len(image.getbands())
+
+    def put(self, filepath, image):
+        """Store the preview of a decoded image and return it"""
+        if image.width > self.max_size[0] or image.height > self.max_size[1]:
+            image = image.copy()
+            image.thumbnail(self.max_size, Image.LANCZOS)
+
+        with self._lock:
+            old = self._previews.pop(filepath, None)
+            if old is not None:
+                self._bytes -= self._cost(old)
+            self._previews[filepath] = image
+            self._bytes += self._cost(image)
+
+            # Always keep the newest preview, even if it alone exceeds the budget
+            while self._bytes > self.budget and len(self._previews) > 1:
+                _, evicted = self._previews.popitem(last=False)
+                self._bytes -= self._cost(evicted)
+        return image
+
+    def get(self, filepath):
+        """Return the preview for a file, decoding it from disk on a miss, or None if unreadable"""
+        with self._lock:
+            image = self._previews.get(filepath)
+            if image is not None:
+                self._previews.move_to_end(filepath)
+                return image
+
+        try:
+            image = self._load(filepath)
+        except OSError:
+            return None
+        return self.put(filepath, image)
+
+    def _load(self, filepath):
+        if self.image_workers:
+            return self.image_workers.thumbnail(filepath, self.max_size)
+        with Image.open(filepath) as image:
+            image.draft("RGB", self.max_size)
+            image.load()
+            image.thumbnail(self.max_size, Image.LANCZOS)
+            return image
+
+    def discard(self, filepath):
+        """Drop the preview of a file"""
+        with self._lock:
+            image = self._previews.pop(filepath, None)
+            if image is not None:
+                self._bytes -= self._cost(image)
 
 
 class RoundedButton(tk.Canvas):
@@ -115,11 +214,16 @@ class RoundedButton(tk.Canvas):
 class ImageCarousel(tk.Toplevel):
     """A window for displaying images in a carousel format"""
 
-    def __init__(self, parent, images=None):
+    def __init__(self, parent, images=None, previews=None, render_cache=None):
         super().__init__(parent)
 
         # Store parent reference
         self.parent = parent
+
+        # Decoded previews of the CarouselItems in images and their rendered frames,
+        # shared with the main window when it passes them in
+        self.previews = previews or PreviewCache()
+        self.render_cache = render_cache or RenderCache(self.previews)
         
         # Check if parent is in arena mode
         self.arena_mode = hasattr(parent, 'arena_mode') and parent.arena_mode
@@ -164,11 +268,18 @@ class ImageCarousel(tk.Toplevel):
         self.images = images or []
         self.current_index = 0
 
+        # Frames are rendered off the Tk thread; only the latest requested one is shown
+        self.frame_request = FrameRequest(self, self.render_cache, self._show_frame)
+        self._frame_size = None
+        self._resize_timer = None
+
         self.configure(bg=self.bg_color)
 
         self.create_widgets()
         self.update_display()
 
+        self.image_frame.bind("<Configure>", self._on_image_frame_resize)
+
         self.bind("<Left>", lambda e: self.prev_image())
         self.bind("<Right>", lambda e: self.next_image())
         self.bind("<Escape>", lambda e: self.destroy())
@@ -361,11 +472,13 @@ class ImageCarousel(tk.Toplevel):
     def update_display(self):
         """Update the display with the current image"""
         if not self.images:
+            self.frame_request.cancel()
             self.model_label.config(text="No images to display")
             self.counter_label.config(text="")
             return
 
-        image, model_name, filepath = self.images[self.current_index]
+        item = self.images[self.current_index]
+        model_name = item.model_name
 
         max_width = self.image_frame.winfo_width() - 40
         max_height = self.image_frame.winfo_height() - 40
@@ -375,89 +488,69 @@ class ImageCarousel(tk.Toplevel):
         if max_height <= 0:
             max_height = 400
 
-        img_width, img_height = image.size
-        scale = min(max_width / max(img_width, 1), max_height / max(img_height, 1))
+        # In arena mode the frame gets arcade-style pixelated borders
+        box = (max_width, max_height)
+        border_size = 15 if self.arena_mode else None
 
-        new_width = int(img_width * scale)
-        new_height = int(img_height * scale)
+        self.frame_request.request(item.filepath, box, border_size)
 
-        # Create a copy before modifying
-        display_image = image.copy()
-        
-        # If in arena mode, apply arcade-style borders and effects
+        # Render the neighbouring frames ahead of navigation
+        index = self.current_index
+        neighbours = self.images[max(0, index - 1):index] + self.images[index + 1:index + 3]
+        self.render_cache.prefetch([neighbour.filepath for neighbour in neighbours], box, border_size)
+
+        # Update text based on arena mode
         if self.arena_mode:
-            # Add a pixelated border
-            border_size = 15
-            bordered_image = Image.new(
-                'RGB', 
-                (new_width + 2*border_size, new_height + 2*border_size), 
-                "#00FF00"  # Neon green border
-            )
-            
-            # Add image inside border
-            resized_image = image.resize((new_width, new_height), Image.LANCZOS)
-            bordered_image.paste(resized_image, (border_size, border_size))
-            
-            # Add pixelated effect to corners
-            draw = ImageDraw.Draw(bordered_image)
-            
-            # Top-left corner
-            draw.rectangle((0, 0, border_size//2, border_size//2), fill="#000000")
-            draw.rectangle((border_size//2, 0, border_size, border_size//2), fill="#00FF00")
-            draw.rectangle((0, border_size//2, border_size//2, border_size), fill="#00FF00")
-            
-            # Top-right corner
-            tr_x = bordered_image.width - border_size
-            draw.rectangle((tr_x, 0, tr_x + border_size//2, border_size//2), fill="#00FF00")
-            draw.rectangle((tr_x + border_size//2, 0, bordered_image.width, border_size//2), fill="#000000")
-            draw.rectangle((tr_x + border_size//2, border_size//2, bordered_image.width, border_size), fill="#00FF00")
-            
-            # Bottom-left corner
-            bl_y = bordered_image.height - border_size
-            draw.rectangle((0, bl_y, border_size//2, bl_y + border_size//2), fill="#00FF00")
-            draw.rectangle((0, bl_y + border_size//2, border_size//2, bordered_image.height), fill="#000000")
-            draw.rectangle((border_size//2, bl_y + border_size//2, border_size, bordered_image.height), fill="#00FF00")
-            
-            # Bottom-right corner
-            br_x = bordered_image.width - border_size
-            br_y = bordered_image.height - border_size
-            draw.rectangle((br_x, br_y, br_x + border_size//2, br_y + border_size//2), fill="#00FF00")
-            draw.rectangle((br_x + border_size//2, br_y, bordered_image.width, br_y + border_size//2), fill="#00FF00")
-            draw.rectangle((br_x + border_size//2, br_y + border_size//2, bordered_image.width, bordered_image.height), fill="#000000")
-            
-            # Use the bordered image
-            display_image = bordered_image
+            self.model_label.config(text=f"CONTENDER #{self.current_index + 1}")
         else:
-            # Normal display - just resize
-            display_image = image.resize((new_width, new_height), Image.LANCZOS)
+            self.model_label.config(text=f"Model: {model_name}")
+            
+        self.counter_label.config(text=f"Image {self.current_index + 1} of {len(self.images)}")
 
-        tk_image = ImageTk.PhotoImage(display_image)
+        self.left_btn.config(state=tk.NORMAL if self.current_index > 0 else tk.DISABLED)
+        self.right_btn.config(state=tk.NORMAL if self.current_index < len(self.images) - 1 else tk.DISABLED)
+
+    def _show_frame(self, key, tk_image):
+        """Show a rendered frame; called by the FrameRequest on the Tk thread"""
+        if tk_image is None:
+            self.model_label.config(text=f"Could not load {key[0]}")
+            return
 
         self.image_label.configure(image=tk_image)
         self.image_label.image = tk_image
 
         self.image_label.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
-        
+
         # Position the gallery button if it exists
         if hasattr(self, 'gallery_button'):
-            parent = self.image_label.master
-            parent.update_idletasks()
             self.gallery_button.place(relx=1.0, rely=1.0, x=-10, y=-10, anchor=tk.SE)
 
-        # Update text based on arena mode
-        if self.arena_mode:
-            self.model_label.config(text=f"CONTENDER #{self.current_index + 1}")
-        else:
-            self.model_label.config(text=f"Model: {model_name}")
-            
-        self.counter_label.config(text=f"Image {self.current_index + 1} of {len(self.images)}")
+    def _on_image_frame_resize(self, event):
+        """Re-render for the new size once the window has stopped resizing"""
+        size = (event.width, event.height)
+        if size == self._frame_size:
+            return
+        self._frame_size = size
 
-        self.left_btn.config(state=tk.NORMAL if self.current_index > 0 else tk.DISABLED)
-        self.right_btn.config(state=tk.NORMAL if self.current_index < len(self.images) - 1 else tk.DISABLED)
+        if self._resize_timer is not None:
+            self.after_cancel(self._resize_timer)
+        self._resize_timer = self.after(100, self._on_resize_settled)
+
+    def _on_resize_settled(self):
+        self._resize_timer = None
+        self.update_display()
 
-    def add_image(self, image, model_name, filepath):
-        """Add a new image to the carousel"""
-        self.images.append((image, model_name, filepath))
+    def destroy(self):
+        """Drop pending renders before closing the window"""
+        self.frame_request.cancel()
+        if self._resize_timer is not None:
+            self.after_cancel(self._resize_timer)
+            self._resize_timer = None
+        super().destroy()
+
+    def add_image(self, item):
+        """Add a new CarouselItem to the carousel"""
+        self.images.append(item)
         if len(self.images) == 1:
             self.update_display()
 
@@ -483,10 +576,10 @@ class ImageCarousel(tk.Toplevel):
         self.current_index = 0
         self.update_display()
 
-    def replace_image(self, index, image, model_name, filepath):
-        """Replace an image at the specified index"""
+    def replace_image(self, index, item):
+        """Replace the CarouselItem at the specified index"""
         if 0 <= index < len(self.images):
-            self.images[index] = (image, model_name, filepath)
+            self.images[index] = item
             if self.current_index == index:
                 self.update_display()
                 
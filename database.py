@@ -0,0 +1,100 @@
+import sqlite3
+import threading
+
+
+class PooledConnection(sqlite3.Connection):
+    """A connection that goes back to its pool when closed instead of being closed
+
+    Callers keep the usual connect() ... close() pattern. close() rolls back anything
+    left uncommitted and resets the row factory, so the next user gets a clean
+    connection with its statement cache intact.
+    """
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        self.row_factory = None
+        self.pool.release(self)
+
+    def close_for_good(self):
+        super().close()
+
+
+class ConnectionPool:
+    """Pool of long-lived connections to one SQLite database
+
+    Every connection uses WAL journaling, so readers and a writer do not block each
+    other, synchronous=NORMAL, which is durable in WAL mode apart from the last
+    transactions on power loss, and a busy timeout instead of failing at once on a
+    locked database. Each connection keeps a cache of prepared statements.
+    Connections may be used by any thread, but by one thread at a time.
+    """
+
+    def __init__(self, db_path, busy_timeout=5.0, cached_statements=256, max_idle=8):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Return an idle connection, opening a new one if there is none"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+            factory=PooledConnection
+        )
+        conn.pool = self
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+        except sqlite3.Error:
+            conn.close_for_good()
+            raise
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            if any(idle is conn for idle in self._idle):
+                # Closed twice; it is already back in the pool
+                return
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close_for_good()
+
+    def close_all(self):
+        """Close the idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close_for_good()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def connect(db_path):
+    """Return a pooled connection to a database; close() hands it back to the pool"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+    return pool.connect()
+
+
+def close_all():
+    """Close the idle connections of every pool, e.g. when the app exits"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
@@ -0,0 +1,176 @@
+import queue
+import sqlite3
+import threading
+import time
+
+import database
+
+
+class DBWriter:
+    """Background thread that group-commits inserts into the database
+
+    insert() and insert_many() only queue their statements, so callers on the Tk
+    thread never wait for the disk. The writer collects queued statements until
+    interval seconds have passed since the first one or max_rows are waiting, then
+    writes them in one transaction. All rows of the same statement go into a single
+    executemany(), with the statements in the order each was first queued, so callers
+    must not rely on any other ordering between rows of different statements.
+
+    A statement's on_commit() runs on the writer thread once its transaction has been
+    committed. A batch that fails because the database is locked or busy is retried
+    up to retries times, waiting retry_delay seconds before the first retry and twice
+    as long before each next one. When a batch fails for any other reason, each
+    insert() or insert_many() in it is retried in a transaction of its own. Whatever
+    still fails is dropped and reported to on_error(exception). An exception raised by
+    on_commit() is reported to on_error() as well and never stops the writer. flush()
+    waits until everything queued so far has been written, and close() flushes and
+    stops the thread.
+    """
+
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, db_path, interval=0.2, max_rows=100, on_error=None, retries=5, retry_delay=0.1):
+        self.db_path = db_path
+        self.interval = interval
+        self.max_rows = max_rows
+        self.on_error = on_error
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def insert(self, sql, params, on_commit=None):
+        """Queue one statement to be executed with params"""
+        self._queue.put(((sql, params), on_commit))
+
+    def insert_many(self, statements, on_commit=None):
+        """Queue several (sql, params) statements that are committed in the same transaction"""
+        self._queue.put((list(statements), on_commit))
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been committed; returns False on timeout"""
+        if not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        """Write everything still queued and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put((self._STOP, None))
+            self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            flushed = []
+            rows = 0
+            deadline = time.monotonic() + self.interval
+
+            # Gather more statements until the batch is due, full, or asked to be written now
+            while True:
+                item, extra = batch[-1]
+                if item is self._STOP:
+                    stopping = True
+                    batch.pop()
+                    break
+                if item is self._FLUSH:
+                    flushed.append(extra)
+                    batch.pop()
+                    break
+                rows += len(item) if isinstance(item, list) else 1
+                remaining = deadline - time.monotonic()
+                if rows >= self.max_rows or remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+            for done in flushed:
+                done.set()
+
+        # Anything queued after close() was called is still written
+        batch = []
+        flushed = []
+        while True:
+            try:
+                item, extra = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._FLUSH:
+                flushed.append(extra)
+            elif item is not self._STOP:
+                batch.append((item, extra))
+        if batch:
+            self._write(batch)
+        for done in flushed:
+            done.set()
+
+    def _write(self, batch):
+        error = self._commit(batch)
+        delay = self.retry_delay
+        for _ in range(self.retries):
+            if not self._is_transient(error):
+                break
+            time.sleep(delay)
+            delay *= 2
+            error = self._commit(batch)
+
+        if error is None:
+            for item, on_commit in batch:
+                if on_commit:
+                    try:
+                        on_commit()
+                    except Exception as e:
+                        self._report(e)
+        elif len(batch) > 1 and not self._is_transient(error):
+            # Retry each queued group on its own so one bad row only loses its own group
+            for entry in batch:
+                self._write([entry])
+        else:
+            self._report(error)
+
+    def _report(self, error):
+        """Pass an error to on_error; a failing handler must not stop the writer thread"""
+        if self.on_error:
+            try:
+                self.on_error(error)
+            except Exception:
+                pass
+
+    @staticmethod
+    def _is_transient(error):
+        """Whether a failed commit may succeed when tried again, e.g. on a locked database"""
+        if not isinstance(error, sqlite3.OperationalError):
+            return False
+        message = str(error).lower()
+        return "locked" in message or "busy" in message
+
+    def _commit(self, batch):
+        """Write a batch in one transaction; returns the exception if it failed"""
+        # Rows of the same statement are written together, statements in first-queued order
+        grouped = {}
+        for item, on_commit in batch:
+            for sql, params in (item if isinstance(item, list) else [item]):
+                grouped.setdefault(sql, []).append(params)
+
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            with conn:
+                for sql, rows in grouped.items():
+                    conn.executemany(sql, rows)
+        except Exception as e:
+            return e
+        finally:
+            if conn:
+                conn.close()
+        return None
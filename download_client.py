@@ -0,0 +1,106 @@
+import os
+import tempfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# os.umask() can only be read by setting it, which is not safe once downloads run on
+# several threads, so read it once on import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+class DownloadClient:
+    """Shared HTTP client for image downloads with pooled keep-alive connections
+
+    All threads share one connection pool per host, so repeated downloads from the
+    Replicate CDN reuse open TCP+TLS connections instead of handshaking every time.
+    Each thread gets its own requests.Session on top of the shared adapter, which
+    keeps session state (cookies, headers) out of reach of other threads.
+    """
+
+    def __init__(self, pool_connections=4, pool_maxsize=16, max_retries=3, backoff_factor=0.3, timeout=10):
+        self.timeout = timeout
+
+        # Retry connection resets, read errors, rate limits and transient server errors
+        # with backoff, waiting as long as a Retry-After header asks
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+
+        # pool_connections is the number of hosts to keep pools for,
+        # pool_maxsize the number of keep-alive connections per host
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry
+        )
+
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _session(self):
+        """Return this thread's session, creating it on first use"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def get(self, url, **kwargs):
+        """Send a GET request through the shared connection pool"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self._session().get(url, **kwargs)
+
+    def download_to_file(self, url, filepath, chunk_size=64 * 1024, **kwargs):
+        """Stream a download into filepath and return the HTTP status code
+
+        Chunks are written to a temporary file next to filepath as they arrive, so
+        memory use is bounded by chunk_size. The temporary file is renamed into place
+        only once the whole body has been received, so readers never see a partial
+        image. The file gets the same permissions open() would have given it. Nothing is
+        written unless the server answers 200.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        with self._session().get(url, stream=True, **kwargs) as response:
+            if response.status_code != 200:
+                return response.status_code
+
+            directory = os.path.dirname(filepath) or "."
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+            try:
+                # mkstemp() creates the file readable by its owner only
+                os.chmod(temp_path, 0o666 & ~_UMASK)
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                os.replace(temp_path, filepath)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+            return response.status_code
+
+    def close(self):
+        """Close all pooled connections"""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self._adapter.close()
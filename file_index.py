@@ -0,0 +1,171 @@
+import os
+import uuid
+from datetime import datetime
+
+import database
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def untracked_image_id(filepath):
+    """Return the stable image ID of a file found on disk rather than saved by the app"""
+    return f"file_{uuid.uuid5(uuid.NAMESPACE_URL, os.path.abspath(filepath))}"
+
+
+class FileIndex:
+    """Persistent index of the image files under the output directory
+
+    The index keeps every image file with its modification time and size, and every
+    directory with its modification time. refresh() only lists directories whose
+    modification time changed, since adding, removing or renaming a file changes the
+    time of the directory holding it; an unchanged tree costs one stat() per directory.
+    In a directory that is listed, a file whose modification time or size differs from
+    the index is updated. A file rewritten in place does not change its directory's
+    time, so it is only picked up the next time something else in its directory changes.
+
+    Image files that are not in the images table, such as files copied into the
+    output directory, are added to it with a stable ID and the prompt and model read
+    from the file name and folder, so the gallery can page and filter them like any
+    other image. Those rows are removed again when their file disappears.
+    """
+
+    def __init__(self, db_path, root_dir):
+        self.db_path = db_path
+        self.root_dir = root_dir
+        self._init_tables()
+
+    def _init_tables(self):
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS image_files (
+                    filepath TEXT PRIMARY KEY,
+                    dirpath TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_image_files_dirpath
+                ON image_files (dirpath)
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS image_dirs (
+                    dirpath TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_images_filepath
+                ON images (filepath)
+            ''')
+            conn.commit()
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def _describe(filepath, mtime):
+        """Return the (prompt, model name, created at) of a file from its name and folder"""
+        # Extract model name from the directory structure
+        model_name = os.path.basename(os.path.dirname(filepath)).replace("_", " ")
+
+        # Try to extract prompt from filename (if using our naming convention)
+        filename_parts = os.path.splitext(os.path.basename(filepath))[0].split('_')
+        if len(filename_parts) > 1:
+            # Last part is likely the timestamp, join the rest for the prompt
+            prompt = " ".join(filename_parts[:-1])
+        else:
+            prompt = "Unknown prompt"
+
+        created_at = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
+        return prompt, model_name, created_at
+
+    def refresh(self):
+        """Bring the index up to date with the disk; returns the number of files added, changed and removed"""
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            known_dirs = dict(conn.execute('SELECT dirpath, mtime_ns FROM image_dirs').fetchall())
+
+            added = []
+            changed = []
+            removed = []
+            changed_dirs = []
+            seen_dirs = set()
+            pending = [self.root_dir]
+            while pending:
+                dirpath = pending.pop()
+                seen_dirs.add(dirpath)
+                try:
+                    mtime_ns = os.stat(dirpath).st_mtime_ns
+                except OSError:
+                    continue
+
+                if known_dirs.get(dirpath) == mtime_ns:
+                    # Unchanged: its subdirectories are the ones already known
+                    pending.extend(d for d in known_dirs if os.path.dirname(d) == dirpath and d != dirpath)
+                    continue
+
+                before = {row[0]: (row[1], row[2]) for row in conn.execute(
+                    'SELECT filepath, mtime_ns, size FROM image_files WHERE dirpath = ?', (dirpath,))}
+                now = {}
+                with os.scandir(dirpath) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            pending.append(entry.path)
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                            now[entry.path] = entry.stat()
+
+                added.extend((filepath, dirpath, now[filepath]) for filepath in now.keys() - before.keys())
+                changed.extend((filepath, dirpath, now[filepath]) for filepath in now.keys() & before.keys()
+                               if (now[filepath].st_mtime_ns, now[filepath].st_size) != before[filepath])
+                removed.extend(before.keys() - now.keys())
+                changed_dirs.append((dirpath, mtime_ns))
+
+            # Directories that are gone take their files with them
+            vanished_dirs = [(dirpath,) for dirpath in known_dirs if dirpath not in seen_dirs]
+            for (dirpath,) in vanished_dirs:
+                removed.extend(row[0] for row in conn.execute(
+                    'SELECT filepath FROM image_files WHERE dirpath = ?', (dirpath,)))
+
+            self._apply(conn, added, changed, removed, changed_dirs, vanished_dirs)
+            return len(added), len(changed), len(removed)
+        finally:
+            if conn:
+                conn.close()
+
+    def _apply(self, conn, added, changed, removed, changed_dirs, vanished_dirs):
+        """Write a refresh in one transaction, backfilling untracked files into images"""
+        with conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO image_files (filepath, dirpath, mtime_ns, size)
+                VALUES (?, ?, ?, ?)
+            ''', [(filepath, dirpath, stat.st_mtime_ns, stat.st_size) for filepath, dirpath, stat in added + changed])
+
+            backfill = []
+            for filepath, dirpath, stat in added:
+                prompt, model_name, created_at = self._describe(filepath, stat.st_mtime)
+                backfill.append((untracked_image_id(filepath), filepath, prompt, model_name, created_at, filepath))
+            conn.executemany('''
+                INSERT OR IGNORE INTO images (image_id, user_id, filepath, prompt, model_name, model_id, created_at)
+                SELECT ?, 'anonymous', ?, ?, ?, '', ?
+                WHERE NOT EXISTS (SELECT 1 FROM images WHERE filepath = ?)
+            ''', backfill)
+
+            # A backfilled row takes its creation time from the file, so follow a rewrite
+            conn.executemany('UPDATE images SET created_at = ? WHERE image_id = ?', [
+                (self._describe(filepath, stat.st_mtime)[2], untracked_image_id(filepath))
+                for filepath, dirpath, stat in changed
+            ])
+
+            conn.executemany('DELETE FROM image_files WHERE filepath = ?', [(filepath,) for filepath in removed])
+            conn.executemany('DELETE FROM images WHERE image_id = ?',
+                             [(untracked_image_id(filepath),) for filepath in removed])
+
+            conn.executemany('''
+                INSERT OR REPLACE INTO image_dirs (dirpath, mtime_ns) VALUES (?, ?)
+            ''', changed_dirs)
+            conn.executemany('DELETE FROM image_dirs WHERE dirpath = ?', vanished_dirs)
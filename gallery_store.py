@@ -0,0 +1,91 @@
+import database
+
+
+class GalleryStore:
+    """Paged reads of the images table for the gallery, newest first
+
+    Pages are fetched with keyset pagination on (created_at, image_id): each page
+    starts after the last row of the previous one, so fetching a page costs the same
+    however far the user has scrolled and however large the table is. The model
+    filter is part of the query and served by an index as well.
+    """
+
+    def __init__(self, db_path, page_size=200):
+        self.db_path = db_path
+        self.page_size = page_size
+        self._init_indexes()
+
+    def _init_indexes(self):
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_images_created
+                ON images (created_at, image_id)
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_images_model_created
+                ON images (model_name, created_at, image_id)
+            ''')
+            conn.commit()
+        finally:
+            if conn:
+                conn.close()
+
+    def page(self, model_name=None, after=None, limit=None):
+        """Return the next page of (image_id, filepath, prompt, model_name, created_at) rows
+
+        after is the last row of the previous page, or None for the first page. Only
+        images of model_name are returned when it is given.
+        """
+        conditions = []
+        params = []
+        if model_name is not None:
+            conditions.append("model_name = ?")
+            params.append(model_name)
+        if after is not None:
+            conditions.append("(created_at, image_id) < (?, ?)")
+            params.extend((after[4], after[0]))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit or self.page_size)
+
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            return conn.execute(f'''
+                SELECT image_id, filepath, prompt, model_name, created_at
+                FROM images
+                {where}
+                ORDER BY created_at DESC, image_id DESC
+                LIMIT ?
+            ''', params).fetchall()
+        finally:
+            if conn:
+                conn.close()
+
+    def pages(self, model_name=None):
+        """Return a function that fetches the next page on each call, and an empty list at the end"""
+        last = None
+
+        def next_page():
+            nonlocal last
+            rows = self.page(model_name, last)
+            if rows:
+                last = rows[-1]
+            return rows
+
+        return next_page
+
+    def model_names(self):
+        """Return the sorted names of the models that have images"""
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            rows = conn.execute('''
+                SELECT DISTINCT model_name FROM images ORDER BY model_name
+            ''').fetchall()
+            return [row[0] for row in rows if row[0]]
+        finally:
+            if conn:
+                conn.close()
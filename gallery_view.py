@@ -0,0 +1,239 @@
+import collections
+import math
+import tkinter as tk
+
+from PIL import ImageTk
+
+
+class _Cell:
+    """Canvas items of one gallery cell, reused for whichever image scrolls into view"""
+
+    __slots__ = ("index", "filepath", "placeholder", "status", "image", "caption", "model")
+
+
+class GalleryGrid(tk.Canvas):
+    """Virtualized grid of gallery thumbnails drawn on a single canvas
+
+    Only the cells of the rows in view exist as canvas items. Cells that scroll out of
+    view are recycled for the ones scrolling in, so the cost of opening and scrolling the
+    gallery does not depend on the number of images. Thumbnails come from a
+    ThumbnailCache; a cell shows a placeholder until its thumbnail has been made in the
+    background, and post(callback, *args) hands the result back to the Tk thread.
+
+    Items are (image_id, filepath, prompt, model_name, created_at) tuples. Clicking a
+    thumbnail calls on_select(image_id). When the items come in pages, more() is called
+    for the next page as the user scrolls near the end, until it returns an empty list.
+    """
+
+    # Fetch the next page when the view is this many rows from the end of the items
+    PRELOAD_ROWS = 4
+
+    def __init__(self, parent, thumbnails, post, on_select=None, log=None,
+                 cell_size=(230, 270), max_photos=256, **kwargs):
+        super().__init__(parent, highlightthickness=0, **kwargs)
+        self.thumbnails = thumbnails
+        self.post = post
+        self.on_select = on_select
+        self.log = log
+        self.cell_width, self.cell_height = cell_size
+        self.max_photos = max_photos
+
+        self.items = []
+        self.more = None
+        self.columns = 1
+        self._cells = {}
+        self._free_cells = []
+        self._photos = collections.OrderedDict()
+        self._scrollbar_set = None
+        self._update_scheduled = False
+
+        # Every change of the view, whatever caused it, goes through yscrollcommand
+        super().configure(yscrollcommand=self._on_view_changed)
+        self.bind("<Configure>", self._on_resize)
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Button-4>", lambda e: self.yview_scroll(-1, "units"))
+        self.bind("<Button-5>", lambda e: self.yview_scroll(1, "units"))
+
+    def attach_scrollbar(self, scrollbar):
+        """Connect a vertical scrollbar to the grid"""
+        scrollbar.configure(command=self.yview)
+        self._scrollbar_set = scrollbar.set
+
+    def set_items(self, items, more=None):
+        """Show a new list of images, scrolled to the top; more() fetches further pages"""
+        for index in list(self._cells):
+            self._release(self._cells.pop(index))
+        self.items = list(items)
+        self.more = more
+        self._layout()
+        self.yview_moveto(0)
+        self._schedule_update()
+
+    def _layout(self):
+        """Fit the number of columns to the current width and size the scroll region"""
+        self.columns = max(1, self.winfo_width() // self.cell_width)
+        self._resize_scrollregion()
+
+    def _resize_scrollregion(self):
+        rows = math.ceil(len(self.items) / self.columns)
+        self.configure(
+            scrollregion=(0, 0, self.columns * self.cell_width, rows * self.cell_height),
+            yscrollincrement=self.cell_height // 4
+        )
+
+    def _on_resize(self, event):
+        if max(1, event.width // self.cell_width) != self.columns:
+            # Every cell moves when the number of columns changes
+            for index in list(self._cells):
+                self._release(self._cells.pop(index))
+            self._layout()
+        self._schedule_update()
+
+    def _on_mousewheel(self, event):
+        self.yview_scroll(-1 if event.delta > 0 else 1, "units")
+
+    def _on_view_changed(self, first, last):
+        if self._scrollbar_set:
+            self._scrollbar_set(first, last)
+        self._schedule_update()
+
+    def _schedule_update(self):
+        if not self._update_scheduled:
+            self._update_scheduled = True
+            self.after_idle(self._update_visible)
+
+    def _update_visible(self):
+        """Recycle the cells that left the view and fill the ones that entered it"""
+        self._update_scheduled = False
+        if not self.winfo_exists():
+            return
+
+        top = self.canvasy(0)
+        bottom = self.canvasy(self.winfo_height())
+        first = max(0, int(top // self.cell_height)) * self.columns
+        last = min(len(self.items), (int(bottom // self.cell_height) + 1) * self.columns)
+        visible = range(first, last)
+
+        if self.more and last + self.columns * self.PRELOAD_ROWS >= len(self.items):
+            page = self.more()
+            if page:
+                self.items.extend(page)
+                self._resize_scrollregion()
+                self._schedule_update()
+            else:
+                self.more = None
+
+        for index in [index for index in self._cells if index not in visible]:
+            self._release(self._cells.pop(index))
+
+        for index in visible:
+            if index not in self._cells:
+                cell = self._free_cells.pop() if self._free_cells else self._new_cell()
+                self._cells[index] = cell
+                self._assign(cell, index)
+
+    def _new_cell(self):
+        cell = _Cell()
+        cell.index = None
+        cell.filepath = None
+        cell.placeholder = self.create_rectangle(0, 0, 0, 0, fill="#dddddd", outline="")
+        cell.status = self.create_text(0, 0, text="Loading...", fill="#666666")
+        cell.image = self.create_image(0, 0, anchor=tk.CENTER)
+        cell.caption = self.create_text(0, 0, anchor=tk.N)
+        cell.model = self.create_text(0, 0, anchor=tk.N)
+
+        for item in (cell.placeholder, cell.status, cell.image):
+            self.tag_bind(item, "<Button-1>", lambda e, cell=cell: self._on_click(cell))
+        return cell
+
+    def _release(self, cell):
+        if cell.filepath is not None and cell.filepath not in self._photos:
+            self.thumbnails.cancel(cell.filepath)
+        for item in (cell.placeholder, cell.status, cell.image, cell.caption, cell.model):
+            self.itemconfigure(item, state=tk.HIDDEN)
+        cell.index = None
+        cell.filepath = None
+        self._free_cells.append(cell)
+
+    def _assign(self, cell, index):
+        image_id, filepath, prompt, model_name, created_at = self.items[index]
+        cell.index = index
+        cell.filepath = filepath
+
+        row, column = divmod(index, self.columns)
+        x = column * self.cell_width + self.cell_width // 2
+        y = row * self.cell_height + 5
+        thumb_width, thumb_height = self.thumbnails.size
+
+        self.coords(cell.placeholder, x - thumb_width // 2, y, x + thumb_width // 2, y + thumb_height)
+        self.coords(cell.status, x, y + thumb_height // 2)
+        self.coords(cell.image, x, y + thumb_height // 2)
+        self.coords(cell.caption, x, y + thumb_height + 8)
+        self.coords(cell.model, x, y + thumb_height + 28)
+
+        caption = (prompt[:25] + "..." if len(prompt) > 25 else prompt) if prompt else ""
+        self.itemconfigure(cell.caption, text=caption, state=tk.NORMAL)
+        self.itemconfigure(cell.model, text=f"Model: {model_name}" if model_name else "", state=tk.NORMAL)
+
+        photo = self._photo(filepath)
+        if photo is not None:
+            self._show_photo(cell, photo)
+            return
+
+        self.itemconfigure(cell.image, image="", state=tk.HIDDEN)
+        self.itemconfigure(cell.placeholder, state=tk.NORMAL)
+        self.itemconfigure(cell.status, text="Loading...", state=tk.NORMAL)
+        self.thumbnails.request(filepath, lambda path, thumb: self.post(self._on_thumbnail, path, thumb))
+
+    def _show_photo(self, cell, photo):
+        self.itemconfigure(cell.placeholder, state=tk.HIDDEN)
+        self.itemconfigure(cell.status, state=tk.HIDDEN)
+        self.itemconfigure(cell.image, image=photo, state=tk.NORMAL)
+
+    def _photo(self, filepath):
+        """Return a PhotoImage of an already made thumbnail, or None"""
+        photo = self._photos.get(filepath)
+        if photo is not None:
+            self._photos.move_to_end(filepath)
+            return photo
+
+        thumb = self.thumbnails.get(filepath)
+        if thumb is None:
+            return None
+        return self._store_photo(filepath, thumb)
+
+    def _store_photo(self, filepath, thumb):
+        photo = ImageTk.PhotoImage(thumb)
+        self._photos[filepath] = photo
+
+        # Never drop a photo that a visible cell is showing
+        shown = {cell.filepath for cell in self._cells.values()}
+        for old in list(self._photos):
+            if len(self._photos) <= self.max_photos:
+                break
+            if old not in shown:
+                del self._photos[old]
+        return photo
+
+    def _on_thumbnail(self, filepath, thumb):
+        """Show a thumbnail made in the background in the cells that still want it"""
+        if not self.winfo_exists():
+            return
+        cells = [cell for cell in self._cells.values() if cell.filepath == filepath]
+
+        if isinstance(thumb, Exception):
+            for cell in cells:
+                self.itemconfigure(cell.status, text="Error loading image")
+            if self.log:
+                self.log(f"Error loading image thumbnail: {str(thumb)}")
+            return
+
+        if not cells:
+            return
+        photo = self._store_photo(filepath, thumb)
+        for cell in cells:
+            self._show_photo(cell, photo)
+
+    def _on_click(self, cell):
+        if self.on_select and cell.index is not None:
+            self.on_select(self.items[cell.index][0])
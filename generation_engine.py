@@ -0,0 +1,713 @@
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+import replicate
+import requests
+from PIL import Image
+from replicate.exceptions import ModelError, ReplicateError
+
+from download_client import DownloadClient
+from pipeline import PipelineStage
+from rate_limiter import ConcurrencyLimiter, is_throttled, parse_retry_after
+from result_cache import ResultCache
+
+
+# Models offered in the UI and accepted by name in batch job files
+AVAILABLE_MODELS = {
+    "Flux Schnell": "black-forest-labs/flux-schnell",
+    "Recraft-v3": "recraft-ai/recraft-v3",
+    "Imagen 3": "google/imagen-3",
+    "Ideogram-v2a-turbo": "ideogram-ai/ideogram-v2a-turbo",
+    "Byte Dance SDXL": "bytedance/sdxl-lightning-4step:6f7a773af6fc3e8de9d5a3c00be77c17308914bf67772726aff83496ba1e3bbe",
+    "Imagen 3 Fast": "google/imagen-3-fast",
+    "Luma Photon Flash": "luma/photon-flash"
+}
+
+
+# A job status change pushed to the engine's event queue
+JobEvent = collections.namedtuple("JobEvent", ["job", "status"])
+
+
+class DownloadError(Exception):
+    """The generated image could not be downloaded"""
+
+
+class GenerationJob:
+    """A single image generation request for one model"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, prompt, model_id, generation_name, display_name=None, timeout=180, input=None,
+                 hedge=False, use_cache=False, variant=0):
+        self.job_id = next(self._ids)
+        # Identifies the job in the job store across restarts
+        self.key = uuid.uuid4().hex
+        self.prompt = prompt
+        self.model_id = model_id
+        self.input = dict(input or {}, prompt=prompt)
+        self.generation_name = generation_name
+        self.display_name = display_name or generation_name
+        # Upper bound for the prediction; the engine may pick a shorter adaptive deadline
+        self.timeout = timeout
+        self.deadline = timeout
+
+        # Start a duplicate prediction if this one runs past the model's p90 latency
+        self.hedge = hedge
+
+        # Reuse a cached image for the same model version and input if there is one.
+        # variant tells apart several images of one prompt that have no explicit seed
+        self.use_cache = use_cache
+        self.variant = variant
+
+        # "Image 2" style suffixes are only for display, the folder uses the model name
+        self.base_model_name = generation_name
+        if "(" in generation_name and ")" in generation_name:
+            self.base_model_name = generation_name.split("(")[0].strip()
+
+        # Filled in by the engine as the job progresses. status is one of queued, running,
+        # downloading, completed, failed, timeout or canceled
+        self.status = "queued"
+        self.version = None
+        self.prediction_id = None
+        # time.monotonic() when Replicate accepted the prediction, for latency samples
+        self.prediction_started = None
+        self.output_url = None
+        self.image = None
+        self.filepath = None
+        self.cached = False
+        self.error = None
+
+        # Set for jobs rebuilt from the job store, whose prediction is already running
+        self.recovered = False
+
+    @classmethod
+    def from_record(cls, record):
+        """Rebuild a job left unfinished by a previous session from its job store record"""
+        job = cls(
+            record['prompt'],
+            record['model_id'],
+            record['generation_name'],
+            display_name=record['display_name'],
+            timeout=record['timeout'],
+            input=record['input'],
+            variant=record['variant']
+        )
+        job.key = record['job_key']
+        job.version = record['version']
+        job.prediction_id = record['prediction_id']
+        job.recovered = True
+        return job
+
+
+class GenerationEngine:
+    """Runs image generation jobs as coroutines on a dedicated event loop thread"""
+
+    # Terminal prediction states reported by the Replicate API
+    FINISHED_STATES = ("succeeded", "failed", "canceled")
+
+    # Job statuses after which nothing changes any more
+    FINAL_STATUSES = ("completed", "failed", "timeout", "canceled")
+
+    def __init__(self, output_dir, max_io_workers=16, download_timeout=10, poll_interval=0.5,
+                 max_poll_interval=5.0, downloader=None, limiter=None, latency_store=None, result_cache=None,
+                 job_store=None, events=None, log=None, download_workers=8, decode_workers=None,
+                 stage_queue_size=16, report_interval=5, image_workers=None, preview_size=None,
+                 decode_images=True):
+        self.output_dir = output_dir
+        self.limiter = limiter or ConcurrencyLimiter()
+        self.latency_store = latency_store
+        self.result_cache = result_cache
+        self.job_store = job_store
+        # Optional thread-safe queue (e.g. queue.Queue) receiving a JobEvent per status change
+        self.events = events
+        # Optional ImageWorkerPool that decodes images in separate processes
+        self.image_workers = image_workers
+        # When set, job.image is scaled down to fit within this (width, height) instead of
+        # holding full-resolution pixels; the file on disk keeps the full image
+        self.preview_size = preview_size
+        # When False, saved images are never decoded and job.image stays None, for callers
+        # such as the batch CLI that only need the files
+        self.decode_images = decode_images
+        self.downloader = downloader or DownloadClient(pool_maxsize=max_io_workers, timeout=download_timeout)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.log = log or (lambda message: None)
+
+        # Replicate clients per API token and resolved model versions per model ID
+        self._clients = {}
+        self._versions = {}
+
+        # Counts of hedged predictions and how many of them the duplicate won
+        self.hedge_stats = {"hedged": 0, "won": 0}
+
+        # Blocking library calls (replicate, requests, PIL) run here so the loop never stalls
+        self._io_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_io_workers,
+            thread_name_prefix="generation-io"
+        )
+
+        # Job store and result cache writes go through a single thread so they land in the
+        # order they happened
+        self._store_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="generation-store"
+        )
+
+        # After its prediction a job moves through the download (network), decode (CPU) and
+        # persist (disk) stages. Each has its own workers and a bounded queue, so a slow disk
+        # or heavy decoding holds back the stages before it rather than prediction slots
+        decode_workers = decode_workers or os.cpu_count() or 2
+        self._download_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=download_workers,
+            thread_name_prefix="generation-download"
+        )
+        self._decode_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=decode_workers,
+            thread_name_prefix="generation-decode"
+        )
+        self._persist_stage = PipelineStage("persist", self._persist_output, 1, stage_queue_size)
+        self._decode_stage = PipelineStage("decode", self._decode_output, decode_workers, stage_queue_size,
+                                           next_stage=self._persist_stage)
+        self._download_stage = PipelineStage("download", self._download_output, download_workers,
+                                             stage_queue_size, next_stage=self._decode_stage)
+        self.stages = (self._download_stage, self._decode_stage, self._persist_stage)
+
+        # Number of unfinished jobs in each status
+        self.status_counts = collections.Counter()
+        self.report_interval = report_interval
+
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(self._io_executor)
+        self._tasks = {}
+        # Set while shutting down without canceling predictions on Replicate
+        self._detaching = False
+
+        self._thread = threading.Thread(target=self._run_loop, name="generation-engine", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        """Event loop thread body"""
+        asyncio.set_event_loop(self.loop)
+        for stage in self.stages:
+            self.loop.call_soon(stage.start)
+        self._reporter = self.loop.create_task(self._report_pipeline())
+        self.loop.run_forever()
+
+    def submit(self, job, on_status=None, on_done=None):
+        """Schedule a job and return a concurrent.futures.Future for it
+
+        on_status(job) is called whenever job.status changes and on_done(job) once the
+        job has finished. Both are called from the engine thread, right after the change
+        was pushed to the events queue.
+        """
+        self._emit(job)
+        return asyncio.run_coroutine_threadsafe(self._run_job(job, on_status, on_done), self.loop)
+
+    def recover(self, on_status=None, on_done=None):
+        """Re-attach to predictions left running when a previous session ended
+
+        Unfinished jobs from the job store that already have a Replicate prediction are
+        resumed: the prediction is polled until it finishes and its output is downloaded
+        as usual. Jobs that never got as far as creating a prediction are marked
+        abandoned. Returns the resumed jobs.
+        """
+        if not self.job_store:
+            return []
+
+        jobs = []
+        for record in self.job_store.unfinished():
+            if not record['prediction_id']:
+                self.job_store.update(record['job_key'], "abandoned")
+                continue
+
+            job = GenerationJob.from_record(record)
+            self.log(f"Resuming prediction {job.prediction_id} for {job.generation_name} from the last session")
+            self.submit(job, on_status, on_done)
+            jobs.append(job)
+        return jobs
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job"""
+        self.loop.call_soon_threadsafe(self._cancel_task, job_id)
+
+    def cancel_all(self):
+        """Cancel every job that has not finished yet"""
+        for job_id in list(self._tasks):
+            self.cancel(job_id)
+
+    def _cancel_task(self, job_id):
+        task = self._tasks.get(job_id)
+        if task and not task.done():
+            task.cancel()
+
+    def shutdown(self, timeout=5, detach=False):
+        """Stop the event loop thread
+
+        Outstanding jobs are canceled, waiting up to timeout seconds for their predictions
+        to be canceled on Replicate. With detach, running predictions are left alone
+        instead so that recover() can collect their outputs in the next session.
+        """
+        self._detaching = detach
+        future = asyncio.run_coroutine_threadsafe(self._cancel_outstanding(), self.loop)
+        try:
+            future.result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._io_executor.shutdown(wait=False)
+        self._download_executor.shutdown(wait=False)
+        self._decode_executor.shutdown(wait=False)
+        # Flush pending job store writes
+        self._store_executor.shutdown(wait=True)
+        self.downloader.close()
+
+    async def _cancel_outstanding(self):
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        self._reporter.cancel()
+        for stage in self.stages:
+            await stage.stop()
+
+    async def _run_job(self, job, on_status, on_done):
+        """Drive one job through prediction, download and save"""
+        self._tasks[job.job_id] = asyncio.current_task()
+
+        def set_status(status):
+            self.status_counts[job.status] -= 1
+            self.status_counts[status] += 1
+            job.status = status
+            # Detached jobs keep their last state so the next session picks them up
+            if not self._detaching:
+                self._persist(job, status)
+            self._emit(job)
+            if on_status:
+                on_status(job)
+
+        self.status_counts[job.status] += 1
+        if not job.recovered:
+            self._persist_new(job)
+
+        try:
+            if not job.recovered and self.result_cache and job.use_cache and await self._load_cached(job):
+                set_status("completed")
+                return job
+
+            # Wait for a free slot with the model's provider before the deadline starts
+            async with self.limiter.slot(job.model_id):
+                set_status("running")
+                self.log(f"Starting generation with {job.generation_name}...")
+
+                if self.latency_store:
+                    job.deadline = self.latency_store.deadline(job.model_id, job.timeout)
+                    if job.deadline < job.timeout:
+                        self.log(f"Using adaptive deadline of {job.deadline:.0f} seconds for {job.generation_name}")
+
+                try:
+                    output = await asyncio.wait_for(self._predict(job), timeout=job.deadline)
+                except asyncio.TimeoutError:
+                    self.log(f"Generation with {job.generation_name} timed out after {job.deadline:.0f} seconds")
+                    if self.latency_store and job.prediction_started is not None:
+                        # Censored sample: the model took at least the deadline. Without it a
+                        # model that slowed down past its deadline could never raise it again
+                        self.loop.run_in_executor(None, self._record_latency, job.model_id, job.deadline)
+                    set_status("timeout")
+                    return job
+
+                if not output:
+                    raise ValueError("Model returned empty result")
+                job.output_url = output[0] if isinstance(output, list) else output
+
+                # Hand the job to the download stage. This only waits while every later
+                # stage is full, so predictions slow down when the pipeline backs up
+                self.log(f"Downloading image from {job.generation_name}...")
+                set_status("downloading")
+                finished = self.loop.create_future()
+                await self._download_stage.put(job, finished)
+
+            await finished
+            set_status("completed")
+
+        except asyncio.CancelledError:
+            if self._detaching:
+                self.log(f"Leaving {job.generation_name} running on Replicate until the next start")
+            else:
+                self.log(f"Generation with {job.generation_name} was canceled")
+            set_status("canceled")
+        except DownloadError as e:
+            job.error = str(e)
+            self.log(job.error)
+            set_status("failed")
+        except requests.exceptions.Timeout:
+            job.error = f"Timeout downloading image from {job.generation_name}"
+            self.log(job.error)
+            set_status("failed")
+        except requests.exceptions.RequestException as e:
+            job.error = f"Network error with {job.generation_name}: {str(e)}"
+            self.log(job.error)
+            set_status("failed")
+        except Exception as e:
+            job.error = f"Failed to generate image with {job.generation_name}: {str(e)}"
+            self.log(job.error)
+            set_status("failed")
+        finally:
+            self._tasks.pop(job.job_id, None)
+            self.status_counts[job.status] -= 1
+            if on_done:
+                on_done(job)
+
+        return job
+
+    async def _download_output(self, job):
+        """Download stage: stream the prediction output to a new file"""
+        filepath = await self.loop.run_in_executor(
+            self._download_executor, self.build_filepath, job.base_model_name, job.prompt
+        )
+        try:
+            status_code = await self._download(job.output_url, filepath)
+        except BaseException:
+            self._discard_placeholder(filepath)
+            raise
+
+        if status_code != 200:
+            self._discard_placeholder(filepath)
+            raise DownloadError(f"Error downloading image from {job.generation_name}: HTTP {status_code}")
+        job.filepath = filepath
+
+    async def _decode_output(self, job):
+        """Decode stage: load the downloaded image"""
+        job.image = await self._decode(job.filepath)
+
+    async def _persist_output(self, job):
+        """Persist stage: record the new image in the result cache"""
+        if self.result_cache:
+            await self.loop.run_in_executor(self._store_executor, self._store_cached, job)
+
+    def pipeline_stats(self):
+        """Return {stage: (queued, busy)}, counting jobs waiting for and holding prediction slots"""
+        stats = {"predict": (self.status_counts["queued"], self.status_counts["running"])}
+        for stage in self.stages:
+            stats[stage.name] = stage.stats()
+        return stats
+
+    async def _report_pipeline(self):
+        """Log the queue depth of every stage whenever it changed while work is in flight"""
+        last = None
+        while True:
+            await asyncio.sleep(self.report_interval)
+            stats = self.pipeline_stats()
+            if stats == last:
+                continue
+            last = stats
+            if any(queued or busy for queued, busy in stats.values()):
+                depths = ", ".join(f"{name} {queued}/{busy}" for name, (queued, busy) in stats.items())
+                self.log(f"Pipeline queued/busy: {depths}")
+
+    def _emit(self, job):
+        """Push the job's current status to the events queue"""
+        if self.events is not None:
+            self.events.put(JobEvent(job, job.status))
+
+    def _persist_new(self, job):
+        """Add a newly queued job to the job store"""
+        if self.job_store:
+            self._store_executor.submit(self._store_call, self.job_store.add, job)
+
+    def _persist(self, job, state=None):
+        """Write a job's state and prediction details to the job store"""
+        if self.job_store:
+            self._store_executor.submit(
+                self._store_call,
+                self.job_store.update,
+                job.key,
+                state,
+                prediction_id=job.prediction_id,
+                version=job.version,
+                filepath=job.filepath,
+                error=job.error
+            )
+
+    def _store_call(self, method, *args, **kwargs):
+        try:
+            method(*args, **kwargs)
+        except sqlite3.Error as e:
+            self.log(f"Database error while recording job state: {str(e)}")
+
+    async def _load_cached(self, job):
+        """Fill in the job from the result cache and return True on a hit"""
+        job.version = await self._resolve_version(self._client(), job.model_id)
+        try:
+            filepath = await self.loop.run_in_executor(None, self.result_cache.get, self._cache_key(job))
+        except sqlite3.Error as e:
+            self.log(f"Database error while reading the result cache: {str(e)}")
+            return False
+
+        if not filepath:
+            return False
+
+        job.filepath = filepath
+        job.image = await self._decode(filepath)
+        job.cached = True
+        self.log(f"Using cached result for {job.generation_name} from {filepath}")
+        return True
+
+    def _store_cached(self, job):
+        try:
+            self.result_cache.put(self._cache_key(job), job.model_id, job.filepath)
+        except sqlite3.Error as e:
+            self.log(f"Database error while writing the result cache: {str(e)}")
+
+    @staticmethod
+    def _cache_key(job):
+        return ResultCache.make_key(job.version, job.input, job.variant)
+
+    def _client(self):
+        """Return a Replicate client for the current API token"""
+        api_token = os.environ.get("REPLICATE_API_TOKEN", "")
+        if api_token not in self._clients:
+            self._clients[api_token] = replicate.Client(api_token=api_token)
+        return self._clients[api_token]
+
+    async def _resolve_version(self, client, model_id):
+        """Return the version ID to run for an "owner/name" or "owner/name:version" model ID"""
+        if ":" in model_id:
+            return model_id.split(":", 1)[1]
+
+        if model_id not in self._versions:
+            model = await client.models.async_get(model_id)
+            if not model.latest_version:
+                raise ValueError(f"Model {model_id} has no published versions")
+            self._versions[model_id] = model.latest_version.id
+        return self._versions[model_id]
+
+    async def _predict(self, job):
+        """Run the job's prediction and return its output, hedging stragglers if enabled"""
+        client = self._client()
+        if job.recovered:
+            prediction = await client.predictions.async_get(job.prediction_id)
+            return (await self._poll_prediction(client, prediction)).output
+
+        version = await self._resolve_version(client, job.model_id)
+        job.version = version
+
+        hedge_after = self._hedge_delay(job)
+        if hedge_after is None:
+            prediction = await self._run_prediction(client, job, version)
+        else:
+            prediction = await self._run_hedged(client, job, version, hedge_after)
+        job.prediction_id = prediction.id
+
+        # Latency counts from Replicate accepting the prediction, not our rate limit waits
+        if self.latency_store and job.prediction_started is not None:
+            latency = time.monotonic() - job.prediction_started
+            self.loop.run_in_executor(None, self._record_latency, job.model_id, latency)
+
+        return prediction.output
+
+    async def _run_prediction(self, client, job, version, hedge=False):
+        """Create a prediction, poll it until it succeeds and return it
+
+        If the job is canceled or misses its deadline the prediction is canceled on
+        Replicate as well, so it stops running and billing.
+        """
+        prediction = await self._create_prediction(client, job, version)
+        if not hedge:
+            job.prediction_started = time.monotonic()
+            # Record the prediction right away so it can be recovered after a crash
+            job.prediction_id = prediction.id
+            self._persist(job)
+
+        return await self._poll_prediction(client, prediction)
+
+    async def _poll_prediction(self, client, prediction):
+        """Poll a prediction until it succeeds and return it, canceling it if the job is canceled"""
+        try:
+            delay = self.poll_interval
+            while prediction.status not in self.FINISHED_STATES:
+                await asyncio.sleep(delay)
+                delay = min(delay * 1.5, self.max_poll_interval)
+                prediction = await client.predictions.async_get(prediction.id)
+        except asyncio.CancelledError:
+            if not self._detaching:
+                await self._cancel_prediction(client, prediction.id)
+            raise
+
+        if prediction.status == "failed":
+            raise ModelError(prediction.error)
+        if prediction.status == "canceled":
+            raise asyncio.CancelledError()
+
+        return prediction
+
+    def _hedge_delay(self, job):
+        """Return how long to wait before hedging a job, or None to not hedge it"""
+        if not job.hedge or not self.latency_store:
+            return None
+        return self.latency_store.percentile(job.model_id, 90)
+
+    async def _run_hedged(self, client, job, version, hedge_after):
+        """Run a prediction and start a duplicate if it passes the model's p90 latency
+
+        Whichever prediction succeeds first wins and the other one is canceled.
+        """
+        primary = asyncio.ensure_future(self._run_prediction(client, job, version))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if done:
+                return primary.result()
+
+            self.hedge_stats["hedged"] += 1
+            self.log(f"{job.generation_name} passed its p90 latency of {hedge_after:.1f} seconds, "
+                     f"starting a hedge request")
+            hedge = asyncio.ensure_future(self._run_prediction(client, job, version, hedge=True))
+            pending.add(hedge)
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        error = error or ValueError("Prediction was canceled on Replicate")
+                    elif task.exception() is not None:
+                        error = error or task.exception()
+                    else:
+                        if task is hedge:
+                            self.hedge_stats["won"] += 1
+                        self._log_hedge_result(job, task is hedge)
+                        return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def _log_hedge_result(self, job, hedge_won):
+        hedged = self.hedge_stats["hedged"]
+        won = self.hedge_stats["won"]
+        winner = "hedge" if hedge_won else "original"
+        self.log(f"The {winner} request for {job.generation_name} finished first. "
+                 f"Hedging so far: {hedged} hedged, {won} won by the hedge ({won / hedged:.0%})")
+
+    def _record_latency(self, model_id, seconds):
+        try:
+            self.latency_store.record(model_id, seconds)
+        except sqlite3.Error as e:
+            self.log(f"Database error while recording latency: {str(e)}")
+
+    async def _create_prediction(self, client, job, version):
+        """Create a prediction within the rate limits, retrying when throttled"""
+        while True:
+            await self.limiter.wait_for_rate(job.model_id)
+
+            # Shield the create call so a cancel arriving mid-request still learns the
+            # prediction ID and can cancel it server-side
+            create_task = asyncio.ensure_future(client.predictions.async_create(version=version, input=job.input))
+            try:
+                return await asyncio.shield(create_task)
+            except asyncio.CancelledError:
+                create_task.add_done_callback(lambda task: self._cancel_created(client, task))
+                raise
+            except ReplicateError as e:
+                if not is_throttled(str(e)):
+                    raise
+                retry_after = parse_retry_after(str(e))
+                self.log(f"{job.generation_name} was rate limited, retrying in {retry_after:g} seconds")
+                self.limiter.throttle(job.model_id, retry_after)
+
+    def _cancel_created(self, client, create_task):
+        """Cancel a prediction whose create request finished after its job was canceled"""
+        if not create_task.cancelled() and create_task.exception() is None:
+            self.loop.create_task(self._cancel_prediction(client, create_task.result().id))
+
+    async def _cancel_prediction(self, client, prediction_id):
+        """Ask Replicate to stop a running prediction"""
+        try:
+            await client.predictions.async_cancel(prediction_id)
+            self.log(f"Canceled prediction {prediction_id} on Replicate")
+        except Exception as e:
+            self.log(f"Could not cancel prediction {prediction_id}: {str(e)}")
+
+    async def _download(self, image_url, filepath):
+        """Stream the generated image to filepath and return the HTTP status code"""
+        return await self.loop.run_in_executor(
+            self._download_executor, self.downloader.download_to_file, image_url, filepath
+        )
+
+    async def _decode(self, filepath):
+        """Decode a saved image, in a worker process if there is an image worker pool
+
+        Returns None without reading the file when decode_images is off.
+        """
+        if not self.decode_images:
+            return None
+        if self.image_workers:
+            if self.preview_size:
+                return await self.loop.run_in_executor(
+                    self._decode_executor, self.image_workers.thumbnail, filepath, self.preview_size
+                )
+            return await self.loop.run_in_executor(self._decode_executor, self.image_workers.decode, filepath)
+        return await self.loop.run_in_executor(self._decode_executor, self.decode_file, filepath, self.preview_size)
+
+    @staticmethod
+    def decode_file(filepath, max_size=None):
+        """Decode an image file through a memory map, scaled down to fit max_size if given
+
+        PIL reads straight from the mapped pages, so the encoded file is never copied
+        into a Python bytes buffer before decoding.
+        """
+        with open(filepath, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                image = Image.open(mapped)
+                if max_size:
+                    image.draft("RGB", max_size)
+                image.load()
+        if max_size:
+            image.thumbnail(max_size, Image.LANCZOS)
+        return image
+
+    @staticmethod
+    def _discard_placeholder(filepath):
+        """Remove the empty file reserved by build_filepath after a failed download"""
+        try:
+            if os.path.getsize(filepath) == 0:
+                os.remove(filepath)
+        except OSError:
+            pass
+
+    def build_filepath(self, model_name, prompt):
+        """Return the output path for a new image from the given model and prompt"""
+        model_dir = os.path.join(self.output_dir, model_name.replace(" ", "_"))
+        if not os.path.exists(model_dir):
+            os.makedirs(model_dir, exist_ok=True)
+
+        sanitized_prompt = re.sub(r'[^\w\s-]', '', prompt)
+        sanitized_prompt = re.sub(r'[\s-]+', '_', sanitized_prompt)
+        sanitized_prompt = sanitized_prompt[:50]
+
+        timestamp = int(time.time())
+
+        # Several images of one prompt can finish within the same second, so reserve
+        # a unique name by creating the file exclusively
+        for attempt in itertools.count():
+            suffix = f"_{attempt}" if attempt else ""
+            filepath = os.path.join(model_dir, f"{sanitized_prompt}_{timestamp}{suffix}.png")
+            try:
+                open(filepath, 'x').close()
+                return filepath
+            except FileExistsError:
+                continue
@@ -3,13 +3,9 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
 import replicate
-from PIL import Image, ImageTk, ImageDraw, ImageFilter
-import io
-import requests
-import re
-import time
+from PIL import Image, ImageTk, ImageFilter
 import json
-import concurrent.futures
+import queue
 from datetime import datetime
 import math
 import sqlite3
@@ -18,7 +14,22 @@ import pandas as pd
 from collections import Counter
 
 # Import ImageCarousel from carousel module
-from carousel import ImageCarousel, RoundedButton
+from carousel import CarouselItem, ImageCarousel, PreviewCache, RoundedButton
+import database
+from db_writer import DBWriter
+from display_resample import downscale, open_for_display
+from file_index import FileIndex, untracked_image_id
+from gallery_store import GalleryStore
+from gallery_view import GalleryGrid
+from generation_engine import AVAILABLE_MODELS, GenerationEngine, GenerationJob
+from image_workers import ImageWorkerPool
+from job_store import JobStore
+from latency_store import LatencyStore
+from rate_limiter import ConcurrencyLimiter
+from render_cache import FrameRequest, RenderCache
+from result_cache import ResultCache
+from thumbnail_cache import ThumbnailCache
+from ui_dispatcher import UIDispatcher
 
 # Custom UI elements and themes
 from tkinter import font
@@ -55,24 +66,24 @@ class ImageGeneratorApp:
         self.style.configure('ImageBg.TFrame', background='#ffffff', relief='groove', borderwidth=2)
 
         # Available models dictionary with name and ID
-        self.available_models = {
-            "Flux Schnell": "black-forest-labs/flux-schnell",
-            "Recraft-v3": "recraft-ai/recraft-v3",
-            "Imagen 3": "google/imagen-3",
-            "Ideogram-v2a-turbo": "ideogram-ai/ideogram-v2a-turbo",
-            "Byte Dance SDXL": "bytedance/sdxl-lightning-4step:6f7a773af6fc3e8de9d5a3c00be77c17308914bf67772726aff83496ba1e3bbe",
-            "Imagen 3 Fast": "google/imagen-3-fast",
-            "Luma Photon Flash": "luma/photon-flash"
-
-        }
+        self.available_models = dict(AVAILABLE_MODELS)
 
         # Track generated images
         self.generated_images = []
         self.image_widgets = []
 
-        # For tracking thread status
+        # Status of each job in the current batch, keyed by job ID, and the number of
+        # jobs in each status. Only touched on the Tk thread
         self.active_generations = {}
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=10)
+        self.generation_names = {}
+        self.generation_counts = Counter()
+        self.generation_finished = True
+
+        # UI updates from background threads are batched and applied once per frame
+        self.ui = UIDispatcher(self.root)
+
+        # The engine pushes job status changes here; they are drained on the Tk thread
+        self.generation_events = queue.Queue()
         self.generation_timeout = 180  # 3 minutes timeout
 
         # Settings directory and file
@@ -92,11 +103,82 @@ class ImageGeneratorApp:
         self.db_path = os.path.join(self.settings_dir, 'rankings.db')
         self.init_database()
 
+        # Image and ranking inserts are group-committed by a background writer thread
+        self.db_writer = DBWriter(
+            self.db_path,
+            on_error=lambda e: self._log_from_thread(f"Database error while saving: {str(e)}")
+        )
+
+        # Per-model latency history for adaptive generation deadlines
+        try:
+            self.latency_store = LatencyStore(self.db_path)
+        except sqlite3.Error as e:
+            self.latency_store = None
+            self.add_log(f"Database error while loading latency history: {str(e)}")
+
+        settings = self.load_settings()
+
+        # Cache of previous results for identical model, prompt and input
+        try:
+            self.result_cache = ResultCache.from_settings(self.db_path, settings)
+        except sqlite3.Error as e:
+            self.result_cache = None
+            self.add_log(f"Database error while opening the result cache: {str(e)}")
+
+        # Durable record of generation jobs so running predictions survive a crash or restart
+        try:
+            self.job_store = JobStore(self.db_path)
+        except sqlite3.Error as e:
+            self.job_store = None
+            self.add_log(f"Database error while opening the job store: {str(e)}")
+
+        # Paged, indexed reads of the images table for the gallery, and the index of the
+        # image files on disk that keeps it in step with the output directory
+        try:
+            self.gallery_store = GalleryStore(self.db_path)
+            self.file_index = FileIndex(self.db_path, self.output_dir)
+        except sqlite3.Error as e:
+            self.gallery_store = None
+            self.file_index = None
+            self.add_log(f"Database error while opening the gallery: {str(e)}")
+
+        # Optional process pool for decoding and resizing, enabled under "image_workers" in settings.json
+        self.image_workers = ImageWorkerPool.from_settings(settings)
+
+        # Display-size previews of carousel images; full-resolution pixels stay on disk.
+        # The preview budget in MB can be set with "preview_cache_mb" in settings.json
+        preview_size = (self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+        self.previews = PreviewCache(
+            max_size=preview_size,
+            budget=settings.get('preview_cache_mb', 64) * 1024 * 1024,
+            image_workers=self.image_workers
+        )
+
+        # Gallery thumbnails are kept on disk and made in the background
+        self.thumbnails = ThumbnailCache(os.path.join(self.settings_dir, 'thumbs'), image_workers=self.image_workers)
+
+        # Rendered carousel frames shared by the embedded and the fullscreen carousel
+        self.render_cache = RenderCache(self.previews, resize=self.resize_for_display)
+
+        # Generation engine runs predictions, downloads and saves off the Tk thread.
+        # Per-provider and per-model limits can be tuned under "rate_limits" in settings.json
+        self.engine = GenerationEngine(
+            self.output_dir,
+            limiter=ConcurrencyLimiter.from_settings(settings),
+            latency_store=self.latency_store,
+            result_cache=self.result_cache,
+            job_store=self.job_store,
+            events=self.generation_events,
+            image_workers=self.image_workers,
+            preview_size=preview_size,
+            log=self._log_from_thread
+        )
+
         # Current user
         self.current_user_id = None
         self.username = "Anonymous User"
 
-        # Image carousel reference
+        # Image carousel reference and its CarouselItems
         self.carousel = None
         self.carousel_images = []
 
@@ -111,6 +193,7 @@ class ImageGeneratorApp:
 
         self.create_widgets()
         self.load_saved_token()
+        self.recover_generations()
 
     def create_menu(self):
         """Create application menu bar"""
@@ -675,6 +758,49 @@ class ImageGeneratorApp:
         timeout_entry = ttk.Entry(timeout_frame, width=10, textvariable=self.timeout_var)
         timeout_entry.pack(anchor=tk.W, pady=5)
 
+        timeout_help_text = ttk.Label(
+            timeout_frame,
+            text="Upper limit. Models with enough history use a shorter timeout learned from past runs.",
+            font=("Helvetica", 9),
+            foreground="#666666",
+            wraplength=250
+        )
+        timeout_help_text.pack(anchor=tk.W, pady=(0, 5))
+
+        self.hedge_requests = tk.BooleanVar(value=False)
+        hedge_cb = ttk.Checkbutton(
+            self.advanced_options,
+            text="Hedge slow predictions",
+            variable=self.hedge_requests
+        )
+        hedge_cb.pack(anchor=tk.W, pady=(5, 0))
+
+        hedge_help_text = ttk.Label(
+            self.advanced_options,
+            text="Start a duplicate request when a model runs slower than usual. The first result wins.",
+            font=("Helvetica", 9),
+            foreground="#666666",
+            wraplength=250
+        )
+        hedge_help_text.pack(anchor=tk.W, pady=(0, 5))
+
+        self.use_result_cache = tk.BooleanVar(value=False)
+        cache_cb = ttk.Checkbutton(
+            self.advanced_options,
+            text="Reuse cached results",
+            variable=self.use_result_cache
+        )
+        cache_cb.pack(anchor=tk.W, pady=(5, 0))
+
+        cache_help_text = ttk.Label(
+            self.advanced_options,
+            text="Show the image generated earlier for the same model and prompt instead of running it again.",
+            font=("Helvetica", 9),
+            foreground="#666666",
+            wraplength=250
+        )
+        cache_help_text.pack(anchor=tk.W, pady=(0, 5))
+
         # Generate button
         button_frame = ttk.Frame(left_panel)
         button_frame.pack(fill=tk.X, pady=10)
@@ -738,6 +864,16 @@ class ImageGeneratorApp:
             self.log_text.see(tk.END)
             self.log_text.config(state=tk.DISABLED)
 
+    def load_settings(self):
+        """Load the settings file, returning an empty dict if it is missing or invalid"""
+        try:
+            if os.path.exists(self.settings_file):
+                with open(self.settings_file, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            self.add_log(f"Error loading settings: {str(e)}")
+        return {}
+
     def save_token_to_file(self, token):
         """Save the API token to a settings file"""
         try:
@@ -838,14 +974,14 @@ class ImageGeneratorApp:
             self.carousel.update_display()
 
         self.active_generations = {}
+        self.generation_names = {}
+        self.generation_counts = Counter()
+        self.generation_finished = False
 
         os.environ["REPLICATE_API_TOKEN"] = api_token
 
         images_per_model = self.images_per_model.get()
 
-        generation_complete = threading.Event()
-
-        futures = []
         for idx, (model_name, model_id) in enumerate(selected_models):
             for image_idx in range(images_per_model):
                 if self.arena_mode:
@@ -858,174 +994,133 @@ class ImageGeneratorApp:
                     display_name = generation_name
 
                 self.add_log(f"Queuing model: {generation_name}")
-                self.active_generations[generation_name] = "queued"
 
-                future = self.executor.submit(
-                    self._generate_image_thread,
-                    api_token,
+                job = GenerationJob(
                     prompt,
-                    generation_name,
                     model_id,
-                    idx * images_per_model + image_idx,
-                    generation_complete,
-                    display_name
+                    generation_name,
+                    display_name=display_name,
+                    timeout=self.generation_timeout,
+                    hedge=self.hedge_requests.get(),
+                    use_cache=self.use_result_cache.get(),
+                    variant=image_idx
                 )
-                futures.append(future)
-
-        self.root.after(1000, self._check_generation_status, futures, generation_complete)
-
-        # Initialize thread results dictionary for the timeout handling
-        self.thread_results = {}
+                self.active_generations[job.job_id] = "queued"
+                self.generation_names[job.job_id] = generation_name
+                self.generation_counts["queued"] += 1
+                self.engine.submit(job, on_status=self._on_generation_status)
 
-    def _generate_image_thread(self, api_token, prompt, generation_name, model_id, position, complete_event, display_name):
-        try:
-            self.root.after(0, lambda: self.add_log(f"Starting generation with {generation_name}..."))
-            self.active_generations[generation_name] = "running"
-
-            base_model_name = generation_name
-            if "(" in generation_name and ")" in generation_name:
-                base_model_name = generation_name.split("(")[0].strip()
+        self._update_generation_progress()
 
-            # Set a timeout for the Replicate API call
-            timeout_seconds = 25  # Reduced timeout to 25 seconds as requested
-            
-            # Create and run a thread with a timeout
-            output = None
-            generation_thread = threading.Thread(
-                target=lambda: self._run_model_with_timeout(model_id, prompt, generation_name)
-            )
-            generation_thread.daemon = True
-            generation_thread.start()
-            generation_thread.join(timeout=timeout_seconds)
-            
-            # Check if thread is still alive (meaning it timed out)
-            if generation_thread.is_alive() or self.active_generations.get(generation_name) == "canceled":
-                if generation_thread.is_alive():
-                    self.root.after(0, lambda: self.add_log(f"Generation with {generation_name} timed out after {timeout_seconds} seconds"))
-                    self.active_generations[generation_name] = "timeout"
-                else:
-                    self.root.after(0, lambda: self.add_log(f"Generation with {generation_name} was canceled"))
-                return
-                
-            # Get the output from the thread's result
-            output = self.thread_results.get(generation_name)
-            if not output:
-                raise ValueError("Model returned empty result")
+    def _log_from_thread(self, message):
+        """Add a log message from a background thread"""
+        self.ui.post(self.add_log, message)
 
-            image_url = output[0] if isinstance(output, list) else output
+    def _on_generation_status(self, job):
+        """Schedule a drain of the generation event queue (called from the engine thread)"""
+        self.ui.post_coalesced("generation-events", self._drain_generation_events)
 
-            self.root.after(0, lambda: self.add_log(f"Downloading image from {generation_name}..."))
+    def _drain_generation_events(self):
+        """Apply every queued generation event on the Tk thread and refresh the progress"""
+        while True:
+            try:
+                event = self.generation_events.get_nowait()
+            except queue.Empty:
+                break
+            self._apply_generation_event(event)
 
-            # Set a timeout for the download request
-            response = requests.get(image_url, timeout=10)
-            if response.status_code == 200:
-                image_data = response.content
+        self._update_generation_progress()
 
-                model_dir = os.path.join(self.output_dir, base_model_name.replace(" ", "_"))
-                if not os.path.exists(model_dir):
-                    os.makedirs(model_dir)
+    def _apply_generation_event(self, event):
+        """Update the status counters for one job and hand its image to the UI"""
+        job, status = event
+        previous = self.active_generations.get(job.job_id)
 
-                sanitized_prompt = re.sub(r'[^\w\s-]', '', prompt)
-                sanitized_prompt = re.sub(r'[\s-]+', '_', sanitized_prompt)
-                sanitized_prompt = sanitized_prompt[:50]
+        # Ignore jobs from earlier batches, repeated events, and jobs that already
+        # reached a final status (a canceled generation stays canceled)
+        if previous is None or previous == status or previous in GenerationEngine.FINAL_STATUSES:
+            return
 
-                timestamp = int(time.time())
-                filename = f"{sanitized_prompt}_{timestamp}.png"
-                filepath = os.path.join(model_dir, filename)
+        self.active_generations[job.job_id] = status
+        self.generation_counts[previous] -= 1
+        self.generation_counts[status] += 1
 
-                with open(filepath, 'wb') as f:
-                    f.write(image_data)
+        if status == "completed" and job.image is not None:
+            # Cached results are already in the database from the run that produced them
+            if not job.cached:
+                self.save_image_to_database(job.filepath, job.prompt, job.generation_name, job.model_id)
+            self.add_to_carousel(job.image, job.display_name, job.filepath, job.generation_name)
+            self.add_log(f"Image generated by {job.generation_name} and saved at {job.filepath}")
 
-                image = Image.open(io.BytesIO(image_data))
+    def recover_generations(self):
+        """Collect the outputs of predictions still running when the app last closed"""
+        api_token = self.token_entry.get().strip()
+        if not api_token:
+            return
+        os.environ["REPLICATE_API_TOKEN"] = api_token
 
-                # Save image to database
-                self.root.after(0, lambda: self.save_image_to_database(filepath, prompt, generation_name, model_id))
+        try:
+            jobs = self.engine.recover(on_done=self._on_recovered_done)
+        except sqlite3.Error as e:
+            self.add_log(f"Database error while recovering generations: {str(e)}")
+            return
 
-                self.root.after(0, lambda: self.add_to_carousel(image, display_name, filepath, generation_name))
+        if jobs:
+            self.add_log(f"Collecting {len(jobs)} generation(s) from the last session")
 
-                self.root.after(0,
-                                lambda: self.add_log(f"Image generated by {generation_name} and saved at {filepath}"))
-            else:
-                error_msg = f"Error downloading image from {generation_name}: HTTP {response.status_code}"
-                self.root.after(0, lambda: self.add_log(error_msg))
-
-        except requests.exceptions.Timeout:
-            error_msg = f"Timeout downloading image from {generation_name}"
-            self.root.after(0, lambda: self.add_log(error_msg))
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Network error with {generation_name}: {str(e)}"
-            self.root.after(0, lambda: self.add_log(error_msg))
-        except concurrent.futures.TimeoutError:
-            error_msg = f"Generation timeout for {generation_name} after {timeout_seconds} seconds"
-            self.root.after(0, lambda: self.add_log(error_msg))
-        except Exception as e:
-            error_msg = f"Failed to generate image with {generation_name}: {str(e)}"
-            self.root.after(0, lambda: self.add_log(error_msg))
-        finally:
-            # Ensure the generation is marked as completed, even if it failed
-            if self.active_generations.get(generation_name) == "running":
-                self.active_generations[generation_name] = "completed"
+    def _on_recovered_done(self, job):
+        """Hand the image of a recovered job to the UI"""
+        if job.image is not None:
+            self.ui.post(self.save_image_to_database, job.filepath, job.prompt, job.generation_name, job.model_id)
+            self.ui.post(self.add_to_carousel, job.image, job.display_name, job.filepath, job.generation_name)
+            self._log_from_thread(f"Recovered image from {job.generation_name} saved at {job.filepath}")
 
-            # Check if all generations are done (completed, canceled, or timed out)
-            if all(status in ["completed", "canceled", "timeout"] for status in self.active_generations.values()):
-                complete_event.set()
-                
     def save_image_to_database(self, filepath, prompt, model_name, model_id):
-        """Save the generated image information to the database"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            image_id = str(uuid.uuid4())
-            user_id = self.current_user_id if self.current_user_id else 'anonymous'
-            
-            cursor.execute('''
+        """Queue the generated image information to be saved to the database"""
+        image_id = str(uuid.uuid4())
+        user_id = self.current_user_id if self.current_user_id else 'anonymous'
+        
+        self.db_writer.insert_many([
+            # The file index may have found the file before it was saved here
+            ('DELETE FROM images WHERE image_id = ?', (untracked_image_id(filepath),)),
+            ('''
                 INSERT INTO images (image_id, user_id, filepath, prompt, model_name, model_id)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (image_id, user_id, filepath, prompt, model_name, model_id))
-            
-            conn.commit()
-            self.add_log(f"Image saved to database with ID: {image_id}")
-            
-        except sqlite3.Error as e:
-            self.add_log(f"Database error while saving image: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
+        ], on_commit=lambda: self._log_from_thread(f"Image saved to database with ID: {image_id}"))
 
-    def _check_generation_status(self, futures, complete_event):
-        """Check the status of image generation threads and update UI"""
-        # Count different states
-        active_count = sum(1 for status in self.active_generations.values() if status in ["queued", "running"])
-        completed_count = sum(1 for status in self.active_generations.values() if status == "completed")
-        canceled_count = sum(1 for status in self.active_generations.values() if status == "canceled")
-        timeout_count = sum(1 for status in self.active_generations.values() if status == "timeout")
+    def _update_generation_progress(self):
+        """Show the progress of the current batch and finish it once no job is active"""
+        if self.generation_finished:
+            return
+
+        counts = self.generation_counts
+        active_count = counts["queued"] + counts["running"] + counts["downloading"]
+        completed_count = counts["completed"]
+        failed_count = counts["failed"]
+        canceled_count = counts["canceled"]
+        timeout_count = counts["timeout"]
         total_count = len(self.active_generations)
 
         if active_count > 0:
             self.progress_var.set(
-                f"Generating: {completed_count}/{total_count} completed, {canceled_count} canceled, {timeout_count} timed out, {active_count} active")
-            self.root.after(1000, self._check_generation_status, futures, complete_event)
-        elif complete_event.is_set() or all(f.done() for f in futures):
-            self.progress_var.set(
-                f"Generation complete: {completed_count}/{total_count} images generated, {canceled_count} canceled, {timeout_count} timed out")
-            self.re_enable_generate_button()
+                f"Generating: {completed_count}/{total_count} completed, {failed_count} failed, {canceled_count} canceled, {timeout_count} timed out, {active_count} active")
+            return
 
-            # Check if we have any successful generations to show
-            if self.carousel_images:
-                if self.arena_mode and len(self.carousel_images) >= 2:  # Need at least 2 images to rank
-                    self.show_voting_interface()
-                else:
-                    self.update_embedded_carousel()
-                    # If in arena mode but not enough images, show message
-                    if self.arena_mode and len(self.carousel_images) < 2:
-                        messagebox.showinfo("Arena Mode", "Not enough images were generated successfully to enter Arena Mode ranking. Please try again with different models.")
-        else:
-            self.progress_var.set("All generations completed or timed out")
-            self.re_enable_generate_button()
+        self.generation_finished = True
+        self.progress_var.set(
+            f"Generation complete: {completed_count}/{total_count} images generated, {failed_count} failed, {canceled_count} canceled, {timeout_count} timed out")
+        self.re_enable_generate_button()
 
-            if self.carousel_images:
-                self.update_embedded_carousel()
+        # Check if we have any successful generations to show
+        if self.carousel_images:
+            if self.arena_mode and len(self.carousel_images) >= 2:  # Need at least 2 images to rank
+                self.show_voting_interface()
+            else:
+                self.ui.post_coalesced("embedded-carousel", self.update_embedded_carousel)
+                # If in arena mode but not enough images, show message
+                if self.arena_mode and len(self.carousel_images) < 2:
+                    messagebox.showinfo("Arena Mode", "Not enough images were generated successfully to enter Arena Mode ranking. Please try again with different models.")
 
     def show_voting_interface(self):
         """Show the voting interface for ranking images"""
@@ -1075,7 +1170,7 @@ class ImageGeneratorApp:
             list_frame.configure(style="Arcade.TFrame")
             self.style.configure("Arcade.TFrame", background="#000000")
 
-        self.ranking_list = [display_name for _, display_name, _ in self.carousel_images]
+        self.ranking_list = [item.model_name for item in self.carousel_images]
 
         # Configure the listbox with arcade theme if in arena mode
         if self.arena_mode:
@@ -1227,133 +1322,116 @@ class ImageGeneratorApp:
         prompt = self.prompt_text.get("1.0", tk.END).strip()
         session_id = str(uuid.uuid4())
 
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+        # Create voting session and store each model's ranking, in one transaction
+        statements = [(
+            "INSERT INTO voting_sessions (session_id, user_id, prompt) VALUES (?, ?, ?)",
+            (session_id, self.current_user_id, prompt)
+        )]
+        for i, item in enumerate(ranking, 1):
+            model_name = image_to_model.get(item, "Unknown model")
+            model_id = model_to_id.get(model_name, "unknown_model_id")
+
+            ranking_id = str(uuid.uuid4())
+            statements.append((
+                """INSERT INTO model_rankings 
+                   (ranking_id, session_id, model_name, model_id, rank_position) 
+                   VALUES (?, ?, ?, ?, ?)""",
+                (ranking_id, session_id, model_name, model_id, i)
+            ))
+
+        self.db_writer.insert_many(
+            statements,
+            on_commit=lambda: self._log_from_thread(f"Rankings saved to database with session ID: {session_id}")
+        )
 
-            # Create voting session
-            cursor.execute(
-                "INSERT INTO voting_sessions (session_id, user_id, prompt) VALUES (?, ?, ?)",
-                (session_id, self.current_user_id, prompt)
+        # Ask if user wants to see the leaderboard
+        if self.arena_mode:
+            result_dialog = tk.Toplevel(window)
+            result_dialog.title("🏆 ARENA RESULTS 🏆")
+            result_dialog.geometry("500x400")
+            result_dialog.configure(bg="#000000")
+            
+            # Center dialog
+            result_dialog.update_idletasks()
+            width = result_dialog.winfo_width()
+            height = result_dialog.winfo_height()
+            x = (result_dialog.winfo_screenwidth() // 2) - (width // 2)
+            y = (result_dialog.winfo_screenheight() // 2) - (height // 2)
+            result_dialog.geometry(f'{width}x{height}+{x}+{y}')
+            
+            # Results frame
+            results_frame = tk.Frame(result_dialog, bg="#000000", bd=5, relief="ridge")
+            results_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+            
+            # Title
+            title_label = tk.Label(
+                results_frame,
+                text="🏆 THE RESULTS ARE IN! 🏆",
+                font=("Courier", 16, "bold"),
+                bg="#000000",
+                fg="#FFFF00"
+            )
+            title_label.pack(pady=(20, 30))
+            
+            # Results text
+            results_text = tk.Text(
+                results_frame,
+                font=("Courier", 12),
+                bg="#111111",
+                fg="#00FF00",
+                relief="sunken",
+                bd=3,
+                height=10,
+                width=40
+            )
+            results_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            results_text.insert(tk.END, message)
+            results_text.config(state=tk.DISABLED)
+            
+            # Button frame
+            button_frame = tk.Frame(results_frame, bg="#000000")
+            button_frame.pack(fill=tk.X, pady=(20, 10))
+            
+            # Show leaderboard button
+            leaderboard_btn = tk.Button(
+                button_frame,
+                text="VIEW LEADERBOARD",
+                font=("Courier", 12, "bold"),
+                bg="#00FF00",
+                fg="#000000",
+                relief="raised",
+                bd=3,
+                command=lambda: [result_dialog.destroy(), window.destroy(), self.exit_arena_mode(), self.show_leaderboard()]
+            )
+            leaderboard_btn.pack(side=tk.LEFT, padx=10)
+            
+            # Close button
+            close_btn = tk.Button(
+                button_frame,
+                text="EXIT ARENA",
+                font=("Courier", 12, "bold"),
+                bg="#FF00FF",
+                fg="#FFFFFF",
+                relief="raised",
+                bd=3,
+                command=lambda: [result_dialog.destroy(), window.destroy(), self.exit_arena_mode()]
+            )
+            close_btn.pack(side=tk.RIGHT, padx=10)
+        else:
+            show_leaderboard = messagebox.askyesno(
+                "Ranking Submitted",
+                message + "\n\nWould you like to see the current leaderboard?",
+                parent=window
             )
 
-            # Store each model's ranking
-            for i, item in enumerate(ranking, 1):
-                model_name = image_to_model.get(item, "Unknown model")
-                model_id = model_to_id.get(model_name, "unknown_model_id")
-
-                ranking_id = str(uuid.uuid4())
-                cursor.execute(
-                    """INSERT INTO model_rankings 
-                       (ranking_id, session_id, model_name, model_id, rank_position) 
-                       VALUES (?, ?, ?, ?, ?)""",
-                    (ranking_id, session_id, model_name, model_id, i)
-                )
-
-            conn.commit()
-            self.add_log(f"Rankings saved to database with session ID: {session_id}")
-
-            # Ask if user wants to see the leaderboard
-            if self.arena_mode:
-                result_dialog = tk.Toplevel(window)
-                result_dialog.title("🏆 ARENA RESULTS 🏆")
-                result_dialog.geometry("500x400")
-                result_dialog.configure(bg="#000000")
-                
-                # Center dialog
-                result_dialog.update_idletasks()
-                width = result_dialog.winfo_width()
-                height = result_dialog.winfo_height()
-                x = (result_dialog.winfo_screenwidth() // 2) - (width // 2)
-                y = (result_dialog.winfo_screenheight() // 2) - (height // 2)
-                result_dialog.geometry(f'{width}x{height}+{x}+{y}')
-                
-                # Results frame
-                results_frame = tk.Frame(result_dialog, bg="#000000", bd=5, relief="ridge")
-                results_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
-                
-                # Title
-                title_label = tk.Label(
-                    results_frame,
-                    text="🏆 THE RESULTS ARE IN! 🏆",
-                    font=("Courier", 16, "bold"),
-                    bg="#000000",
-                    fg="#FFFF00"
-                )
-                title_label.pack(pady=(20, 30))
-                
-                # Results text
-                results_text = tk.Text(
-                    results_frame,
-                    font=("Courier", 12),
-                    bg="#111111",
-                    fg="#00FF00",
-                    relief="sunken",
-                    bd=3,
-                    height=10,
-                    width=40
-                )
-                results_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-                results_text.insert(tk.END, message)
-                results_text.config(state=tk.DISABLED)
-                
-                # Button frame
-                button_frame = tk.Frame(results_frame, bg="#000000")
-                button_frame.pack(fill=tk.X, pady=(20, 10))
-                
-                # Show leaderboard button
-                leaderboard_btn = tk.Button(
-                    button_frame,
-                    text="VIEW LEADERBOARD",
-                    font=("Courier", 12, "bold"),
-                    bg="#00FF00",
-                    fg="#000000",
-                    relief="raised",
-                    bd=3,
-                    command=lambda: [result_dialog.destroy(), window.destroy(), self.exit_arena_mode(), self.show_leaderboard()]
-                )
-                leaderboard_btn.pack(side=tk.LEFT, padx=10)
-                
-                # Close button
-                close_btn = tk.Button(
-                    button_frame,
-                    text="EXIT ARENA",
-                    font=("Courier", 12, "bold"),
-                    bg="#FF00FF",
-                    fg="#FFFFFF",
-                    relief="raised",
-                    bd=3,
-                    command=lambda: [result_dialog.destroy(), window.destroy(), self.exit_arena_mode()]
-                )
-                close_btn.pack(side=tk.RIGHT, padx=10)
-            else:
-                show_leaderboard = messagebox.askyesno(
-                    "Ranking Submitted",
-                    message + "\n\nWould you like to see the current leaderboard?",
-                    parent=window
-                )
-
-                if show_leaderboard:
-                    window.destroy()
-                    self.arena_mode = False
-                    self.show_leaderboard()
-                else:
-                    messagebox.showinfo("Ranking Submitted", message, parent=window)
-                    window.destroy()
-                    self.arena_mode = False
-
-        except sqlite3.Error as e:
-            self.add_log(f"Database error while saving rankings: {str(e)}")
-            messagebox.showerror("Error", f"Failed to save rankings: {str(e)}", parent=window)
-            messagebox.showinfo("Ranking Submitted", message, parent=window)
-            window.destroy()
-            if self.arena_mode:
-                self.exit_arena_mode()
+            if show_leaderboard:
+                window.destroy()
+                self.arena_mode = False
+                self.show_leaderboard()
             else:
+                messagebox.showinfo("Ranking Submitted", message, parent=window)
+                window.destroy()
                 self.arena_mode = False
-        finally:
-            if conn:
-                conn.close()
 
     def re_enable_generate_button(self):
         """Re-enable the generate button and disable the cancel menu item"""
@@ -1367,44 +1445,63 @@ class ImageGeneratorApp:
 
     def cancel_generation(self):
         """Cancel all active generations"""
-        for model_name, status in self.active_generations.items():
-            if status in ["queued", "running"]:
-                self.active_generations[model_name] = "canceled"
-                self.add_log(f"Canceling generation for {model_name}")
+        for job_id, status in self.active_generations.items():
+            if status not in GenerationEngine.FINAL_STATUSES:
+                self.active_generations[job_id] = "canceled"
+                self.generation_counts[status] -= 1
+                self.generation_counts["canceled"] += 1
+                self.add_log(f"Canceling generation for {self.generation_names[job_id]}")
+
+        self.engine.cancel_all()
 
-        self.progress_var.set("Canceling all active generations...")
         self.add_log("Canceled all active generations")
-        self.re_enable_generate_button()
+        self._update_generation_progress()
 
     def add_to_carousel(self, image, model_name, filepath, identifier=None):
-        """Add an image to the carousel collection"""
-        existing_indices = [i for i, (_, name, _) in enumerate(self.carousel_images) if name == model_name]
+        """Add an image to the carousel collection
+
+        Only a display-size preview of image is kept; the carousel item refers to the file.
+        """
+        self.previews.put(filepath, image)
+        item = CarouselItem.from_image(image, model_name, filepath)
+        existing_indices = [i for i, existing in enumerate(self.carousel_images) if existing.model_name == model_name]
 
         if existing_indices:
             index = existing_indices[0]
-            self.carousel_images[index] = (image, model_name, filepath)
+            self.carousel_images[index] = item
 
             if self.embedded_current_index == index:
-                self.update_embedded_carousel()
+                self.refresh_carousels()
 
             if self.carousel and self.carousel.winfo_exists():
-                self.carousel.images[index] = (image, model_name, filepath)
+                self.carousel.replace_image(index, item)
                 if self.carousel.current_index == index:
-                    self.carousel.update_display()
+                    self.refresh_carousels()
 
             self.add_log(f"Updated existing image for {model_name}")
         else:
-            self.carousel_images.append((image, model_name, filepath))
+            self.carousel_images.append(item)
             self.embedded_current_index = len(self.carousel_images) - 1
-            self.update_embedded_carousel()
 
             if self.carousel and self.carousel.winfo_exists():
-                self.carousel.add_image(image, model_name, filepath)
+                self.carousel.images.append(item)
                 self.carousel.current_index = self.embedded_current_index
-                self.carousel.update_display()
+            self.refresh_carousels()
 
             self.add_log(f"Added new image for {model_name}")
 
+    def refresh_carousels(self):
+        """Re-render the embedded and fullscreen carousels once in the next frame
+
+        Images landing in the same frame share a single render of the newest one.
+        """
+        self.ui.post_coalesced("embedded-carousel", self.update_embedded_carousel)
+        self.ui.post_coalesced("carousel", self._refresh_fullscreen_carousel)
+
+    def _refresh_fullscreen_carousel(self):
+        if self.carousel and self.carousel.winfo_exists():
+            self.carousel.update_display()
+
     def show_carousel(self):
         """Show the image carousel in a fullscreen window"""
         self.show_fullscreen_carousel()
@@ -1412,12 +1509,25 @@ class ImageGeneratorApp:
     def on_closing(self):
         """Handle application closing"""
         try:
+            # Write queued rows before anything below can fail
+            self.db_writer.flush()
             if self.carousel and self.carousel.winfo_exists():
                 self.carousel.destroy()
-            self.executor.shutdown(wait=False)
-            self.root.destroy()
+            # Leave running predictions to be collected on the next start
+            self.engine.shutdown(detach=self.job_store is not None)
+            self.embedded_frame_request.cancel()
+            self.render_cache.shutdown()
+            self.thumbnails.shutdown()
+            if self.image_workers:
+                self.image_workers.shutdown()
         except:
-            self.root.destroy()
+            pass
+        finally:
+            try:
+                self.db_writer.close()
+                database.close_all()
+            finally:
+                self.root.destroy()
 
     def create_embedded_carousel(self):
         """Create an embedded carousel in the main window"""
@@ -1508,9 +1618,16 @@ class ImageGeneratorApp:
 
         self.embedded_current_index = 0
 
+        # Frames are rendered off the Tk thread; only the latest requested one is shown
+        self.embedded_frame_request = FrameRequest(self.root, self.render_cache, self._show_embedded_frame)
+        self._embedded_frame_size = None
+        self._embedded_resize_timer = None
+        self.embedded_image_frame.bind("<Configure>", self._on_embedded_frame_resize)
+
     def update_embedded_carousel(self):
         """Update the embedded carousel with the current image"""
         if not self.carousel_images:
+            self.embedded_frame_request.cancel()
             self.embedded_model_label.config(text="No images yet")
             self.embedded_counter_label.config(text="")
             self.fullscreen_button.config(state=tk.DISABLED)
@@ -1520,7 +1637,8 @@ class ImageGeneratorApp:
         self.fullscreen_button.config(state=tk.NORMAL)
         self.gallery_button.config(state=tk.NORMAL)
 
-        image, model_name, filepath = self.carousel_images[self.embedded_current_index]
+        item = self.carousel_images[self.embedded_current_index]
+        model_name = item.model_name
 
         max_width = self.embedded_image_frame.winfo_width() - 40
         max_height = self.embedded_image_frame.winfo_height() - 40
@@ -1530,73 +1648,16 @@ class ImageGeneratorApp:
         if max_height <= 0:
             max_height = 400
 
-        img_width, img_height = image.size
-        scale = min(max_width / max(img_width, 1), max_height / max(img_height, 1))
-
-        new_width = int(img_width * scale)
-        new_height = int(img_height * scale)
-
-        # Create a copy before modifying
-        display_image = image.copy()
-        
-        # If in arena mode, apply arcade-style borders and effects
-        if self.arena_mode:
-            # Add a pixelated border
-            border_size = 10
-            bordered_image = Image.new(
-                'RGB', 
-                (new_width + 2*border_size, new_height + 2*border_size), 
-                "#00FF00"  # Neon green border
-            )
-            
-            # Add image inside border
-            resized_image = image.resize((new_width, new_height), Image.LANCZOS)
-            bordered_image.paste(resized_image, (border_size, border_size))
-            
-            # Add pixelated effect to corners
-            draw = ImageDraw.Draw(bordered_image)
-            
-            # Top-left corner
-            draw.rectangle((0, 0, border_size//2, border_size//2), fill="#000000")
-            draw.rectangle((border_size//2, 0, border_size, border_size//2), fill="#00FF00")
-            draw.rectangle((0, border_size//2, border_size//2, border_size), fill="#00FF00")
-            
-            # Top-right corner
-            tr_x = bordered_image.width - border_size
-            draw.rectangle((tr_x, 0, tr_x + border_size//2, border_size//2), fill="#00FF00")
-            draw.rectangle((tr_x + border_size//2, 0, bordered_image.width, border_size//2), fill="#000000")
-            draw.rectangle((tr_x + border_size//2, border_size//2, bordered_image.width, border_size), fill="#00FF00")
-            
-            # Bottom-left corner
-            bl_y = bordered_image.height - border_size
-            draw.rectangle((0, bl_y, border_size//2, bl_y + border_size//2), fill="#00FF00")
-            draw.rectangle((0, bl_y + border_size//2, border_size//2, bordered_image.height), fill="#000000")
-            draw.rectangle((border_size//2, bl_y + border_size//2, border_size, bordered_image.height), fill="#00FF00")
-            
-            # Bottom-right corner
-            br_x = bordered_image.width - border_size
-            br_y = bordered_image.height - border_size
-            draw.rectangle((br_x, br_y, br_x + border_size//2, br_y + border_size//2), fill="#00FF00")
-            draw.rectangle((br_x + border_size//2, br_y, bordered_image.width, br_y + border_size//2), fill="#00FF00")
-            draw.rectangle((br_x + border_size//2, br_y + border_size//2, bordered_image.width, bordered_image.height), fill="#000000")
-            
-            # Use the bordered image
-            display_image = bordered_image
-        else:
-            # Normal display - just resize
-            display_image = image.resize((new_width, new_height), Image.LANCZOS)
-
-        tk_image = ImageTk.PhotoImage(display_image)
+        # In arena mode the frame gets arcade-style pixelated borders
+        box = (max_width, max_height)
+        border_size = 10 if self.arena_mode else None
 
-        self.embedded_image_label.configure(image=tk_image)
-        self.embedded_image_label.image = tk_image
+        self.embedded_frame_request.request(item.filepath, box, border_size)
 
-        self.embedded_image_label.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
-
-        parent = self.fullscreen_button.master
-        parent.update_idletasks()
-        self.fullscreen_button.place(relx=1.0, rely=1.0, x=-10, y=-10, anchor=tk.SE)
-        self.gallery_button.place(relx=1.0, rely=1.0, x=-50, y=-10, anchor=tk.SE)
+        # Render the neighbouring frames ahead of navigation
+        index = self.embedded_current_index
+        neighbours = self.carousel_images[max(0, index - 1):index] + self.carousel_images[index + 1:index + 3]
+        self.render_cache.prefetch([neighbour.filepath for neighbour in neighbours], box, border_size)
 
         # Update label text based on arena mode
         if self.arena_mode:
@@ -1615,17 +1676,58 @@ class ImageGeneratorApp:
         self.embedded_left_btn.config(state=tk.NORMAL if has_prev else tk.DISABLED)
         self.embedded_right_btn.config(state=tk.NORMAL if has_next else tk.DISABLED)
         
+    def _show_embedded_frame(self, key, tk_image):
+        """Show a rendered frame in the embedded carousel; called by its FrameRequest on the Tk thread"""
+        if tk_image is None:
+            self.embedded_model_label.config(text=f"Could not load {key[0]}")
+            return
+
+        self.embedded_image_label.configure(image=tk_image)
+        self.embedded_image_label.image = tk_image
+
+        self.embedded_image_label.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
+
+        self.fullscreen_button.place(relx=1.0, rely=1.0, x=-10, y=-10, anchor=tk.SE)
+        self.gallery_button.place(relx=1.0, rely=1.0, x=-50, y=-10, anchor=tk.SE)
+
+    def _on_embedded_frame_resize(self, event):
+        """Re-render the embedded carousel for the new size once resizing has stopped"""
+        size = (event.width, event.height)
+        if size == self._embedded_frame_size:
+            return
+        self._embedded_frame_size = size
+
+        if self._embedded_resize_timer is not None:
+            self.root.after_cancel(self._embedded_resize_timer)
+        self._embedded_resize_timer = self.root.after(100, self._on_embedded_resize_settled)
+
+    def _on_embedded_resize_settled(self):
+        self._embedded_resize_timer = None
+        if self.carousel_images:
+            self.update_embedded_carousel()
+
+    def resize_for_display(self, image, size):
+        """Resize an image for display, in a worker process if there is an image worker pool"""
+        if self.image_workers:
+            return self.image_workers.resize(image, size, Image.LANCZOS)
+        return downscale(image, size)
+
     def view_current_in_gallery(self):
         """View the current carousel image in the gallery detail view"""
         if not self.carousel_images:
             return
             
         # Get the current image information
-        _, model_name, filepath = self.carousel_images[self.embedded_current_index]
+        item = self.carousel_images[self.embedded_current_index]
+        model_name, filepath = item.model_name, item.filepath
         
+        # Include rows still queued in the background writer
+        self.db_writer.flush()
+
+        conn = None
         try:
             # Look up the image in the database by filepath
-            conn = sqlite3.connect(self.db_path)
+            conn = database.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -1668,7 +1770,13 @@ class ImageGeneratorApp:
 
     def show_fullscreen_carousel(self):
         """Show the image carousel in a fullscreen window"""
-        self.carousel = ImageCarousel(self.root, self.carousel_images)
+        # The carousel gets its own list; add_to_carousel adds new items to both
+        self.carousel = ImageCarousel(
+            self.root,
+            list(self.carousel_images),
+            previews=self.previews,
+            render_cache=self.render_cache
+        )
         self.carousel.title(f"Generated Images - {len(self.carousel_images)} images")
 
         self.carousel.current_index = self.embedded_current_index
@@ -1775,7 +1883,7 @@ class ImageGeneratorApp:
     def _enhance_prompt_thread(self, original_prompt):
         """Run prompt enhancement in a separate thread"""
         try:
-            self.root.after(0, lambda: self.add_log(f"Starting prompt enhancement with text: '{original_prompt}'"))
+            self.ui.post(self.add_log, f"Starting prompt enhancement with text: '{original_prompt}'")
 
             system_prompt = "You are a creative assistant that helps enhance text prompts for AI image generation."
 
@@ -1792,7 +1900,7 @@ class ImageGeneratorApp:
             Return ONLY the enhanced prompt text with no explanations, introductions, or other text.
             """
 
-            self.root.after(0, lambda: self.add_log("Calling Claude API via Replicate..."))
+            self.ui.post(self.add_log, "Calling Claude API via Replicate...")
 
             output = replicate.run(
                 "anthropic/claude-3.7-sonnet",
@@ -1813,15 +1921,15 @@ class ImageGeneratorApp:
 
             if not enhanced_prompt.strip():
                 enhanced_prompt = "Could not enhance the prompt. Please try again or use the original prompt."
-                self.root.after(0, lambda: self.add_log("Warning: Received empty response from API"))
+                self.ui.post(self.add_log, "Warning: Received empty response from API")
 
-            self.root.after(0, lambda: self._display_enhanced_prompt(enhanced_prompt))
+            self.ui.post(self._display_enhanced_prompt, enhanced_prompt)
 
         except Exception as e:
             error_msg = f"Error enhancing prompt: {str(e)}"
-            self.root.after(0, lambda: self.add_log(error_msg))
-            self.root.after(0, lambda: self.progress_var.set(""))
-            self.root.after(0, lambda: messagebox.showerror("Error", error_msg))
+            self.ui.post(self.add_log, error_msg)
+            self.ui.post(self.progress_var.set, "")
+            self.ui.post(messagebox.showerror, "Error", error_msg)
 
     def _display_enhanced_prompt(self, enhanced_prompt):
         """Display the enhanced prompt in the UI"""
@@ -1847,8 +1955,9 @@ class ImageGeneratorApp:
 
     def init_database(self):
         """Initialize the SQLite database with necessary tables if they don't exist"""
+        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = database.connect(self.db_path)
             cursor = conn.cursor()
 
             # Create users table
@@ -1971,8 +2080,9 @@ class ImageGeneratorApp:
             messagebox.showerror("Error", "Please enter a valid username", parent=dialog)
             return
 
+        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = database.connect(self.db_path)
             cursor = conn.cursor()
 
             # Check if user already exists
@@ -2130,8 +2240,12 @@ class ImageGeneratorApp:
 
     def get_model_rankings(self):
         """Get aggregated model rankings from the database"""
+        # Include rows still queued in the background writer
+        self.db_writer.flush()
+
+        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = database.connect(self.db_path)
             cursor = conn.cursor()
 
             # Get all rankings
@@ -2182,9 +2296,13 @@ class ImageGeneratorApp:
 
     def show_advanced_statistics(self):
         """Show advanced statistics and analytics from the ranking data"""
+        # Include rows still queued in the background writer
+        self.db_writer.flush()
+
+        conn = None
         try:
             # Fetch all the ranking data
-            conn = sqlite3.connect(self.db_path)
+            conn = database.connect(self.db_path)
 
             # Get all sessions with user info
             sessions_df = pd.read_sql_query("""
@@ -2346,30 +2464,22 @@ class ImageGeneratorApp:
             self.add_log(f"Error exporting statistics: {str(e)}")
             messagebox.showerror("Error", f"Failed to export statistics: {str(e)}")
 
-    def _run_model_with_timeout(self, model_id, prompt, generation_name):
-        """Run a model with input and store the result for the generation thread"""
-        try:
-            if not hasattr(self, 'thread_results'):
-                self.thread_results = {}
-                
-            result = replicate.run(
-                model_id,
-                input={"prompt": prompt}
-            )
-            
-            # Store result if generation hasn't been canceled
-            if self.active_generations.get(generation_name) != "canceled":
-                self.thread_results[generation_name] = result
-        except Exception as e:
-            self.add_log(f"Error in model execution thread: {str(e)}")
-
     def show_gallery(self):
         """Show the gallery of all generated images"""
         try:
-            # Get all images from database and from the output directory
-            all_images = self.get_gallery_images()
+            if self.gallery_store is None:
+                raise sqlite3.Error("the gallery database is not available")
+
+            # Include images still queued in the background writer
+            self.db_writer.flush()
+
+            # Pick up image files added or removed outside the app; only changed folders are listed
+            try:
+                self.file_index.refresh()
+            except OSError as e:
+                self.add_log(f"Error scanning image directory: {str(e)}")
             
-            if not all_images:
+            if not self.gallery_store.page(limit=1):
                 self.add_log("No images found in gallery")
                 messagebox.showinfo("Gallery Empty", "No images found in the gallery")
                 return
@@ -2388,7 +2498,7 @@ class ImageGeneratorApp:
             ttk.Label(filter_frame, text="Filter by model:").pack(side=tk.LEFT, padx=5)
             
             # Get unique model names from all images
-            model_names = sorted(set(image[3] for image in all_images if image[3]))
+            model_names = self.gallery_store.model_names()
             model_names.insert(0, "All Models")  # Add option to show all models
             
             # Variable to store selected model
@@ -2399,86 +2509,40 @@ class ImageGeneratorApp:
             model_dropdown.pack(side=tk.LEFT, padx=5)
             
             # Label to show count of displayed images
-            image_count_var = tk.StringVar(value=f"Showing {len(all_images)} images")
+            image_count_var = tk.StringVar(value="")
             ttk.Label(filter_frame, textvariable=image_count_var).pack(side=tk.RIGHT, padx=10)
             
-            # Create canvas for scrolling
-            canvas = tk.Canvas(gallery_window)
-            scrollbar = ttk.Scrollbar(gallery_window, orient="vertical", command=canvas.yview)
-            scrollable_frame = ttk.Frame(canvas)
-            
-            scrollable_frame.bind(
-                "<Configure>",
-                lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+            # Virtualized grid: only the rows in view are drawn, whatever the number of images
+            scrollbar = ttk.Scrollbar(gallery_window, orient="vertical")
+            grid = GalleryGrid(
+                gallery_window,
+                self.thumbnails,
+                post=self.ui.post,
+                on_select=self.show_image_details,
+                log=self.add_log
             )
+            grid.attach_scrollbar(scrollbar)
             
-            canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-            canvas.configure(yscrollcommand=scrollbar.set)
-            
-            # Pack canvas and scrollbar
-            canvas.pack(side="left", fill="both", expand=True)
+            # Pack grid and scrollbar
+            grid.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=10)
             scrollbar.pack(side="right", fill="y")
             
-            # Frame for the grid of images
-            grid_frame = ttk.Frame(scrollable_frame)
-            grid_frame.pack(fill="both", expand=True, padx=10, pady=10)
-            
-            # Store references to prevent garbage collection
-            self.thumbnail_refs = []
-            
             # Function to update gallery based on filter
             def update_gallery(*args):
-                # Clear previous images
-                for widget in grid_frame.winfo_children():
-                    widget.destroy()
-                
-                self.thumbnail_refs.clear()
-                
-                # Filter images based on selected model
+                # The filter is applied in the query; pages are fetched as the grid scrolls
                 selected = selected_model.get()
-                filtered_images = all_images if selected == "All Models" else [img for img in all_images if img[3] == selected]
-                
-                # Update count
-                image_count_var.set(f"Showing {len(filtered_images)} images")
-                
-                # Number of columns in the grid
-                num_columns = 4
-                
-                # Display images in grid
-                for i, (image_id, filepath, prompt, model_name, created_at) in enumerate(filtered_images):
-                    row = i // num_columns
-                    col = i % num_columns
-                    
-                    # Create frame for each image
-                    img_frame = ttk.Frame(grid_frame, padding=5)
-                    img_frame.grid(row=row, column=col, padx=5, pady=5, sticky="nsew")
-                    
-                    try:
-                        # Open and resize image for thumbnail
-                        img = Image.open(filepath)
-                        img.thumbnail((200, 200))
-                        photo = ImageTk.PhotoImage(img)
-                        self.thumbnail_refs.append(photo)  # Keep reference
-                        
-                        # Create image label
-                        img_label = ttk.Label(img_frame, image=photo)
-                        img_label.pack(fill="both", expand=True)
-                        
-                        # Add click event to show details
-                        img_label.bind("<Button-1>", lambda e, id=image_id: self.show_image_details(id))
-                        
-                        # Add caption with truncated prompt
-                        if prompt:
-                            caption = prompt[:25] + "..." if len(prompt) > 25 else prompt
-                            ttk.Label(img_frame, text=caption).pack()
-                        
-                        # Add model name if available
-                        if model_name:
-                            ttk.Label(img_frame, text=f"Model: {model_name}").pack()
-                    
-                    except Exception as e:
-                        ttk.Label(img_frame, text="Error loading image").pack()
-                        self.add_log(f"Error loading image thumbnail: {str(e)}")
+                next_page = self.gallery_store.pages(None if selected == "All Models" else selected)
+                loaded = 0
+
+                def load_page():
+                    nonlocal loaded
+                    page = next_page()
+                    loaded += len(page)
+                    # Update count
+                    image_count_var.set(f"Showing {loaded} images")
+                    return page
+
+                grid.set_items(load_page(), more=load_page)
             
             # Bind the update function to the dropdown
             selected_model.trace_add("write", update_gallery)
@@ -2490,79 +2554,11 @@ class ImageGeneratorApp:
             self.add_log(f"Error showing gallery: {str(e)}")
             messagebox.showerror("Error", f"Could not show gallery: {str(e)}")
 
-    def get_gallery_images(self):
-        """Get all images from the database and from the output directory"""
-        all_images = []
-        try:
-            # First get images from database
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT image_id, filepath, prompt, model_name, created_at
-                FROM images
-                ORDER BY created_at DESC
-            ''')
-            
-            db_images = {filepath: (image_id, filepath, prompt, model_name, created_at) 
-                        for image_id, filepath, prompt, model_name, created_at in cursor.fetchall()}
-            
-            # Add database images to the results
-            all_images.extend(list(db_images.values()))
-            
-            # Then scan the output directory for any images not in the database
-            for root, dirs, files in os.walk(self.output_dir):
-                for file in files:
-                    if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                        filepath = os.path.join(root, file)
-                        
-                        # Skip if already added from database
-                        if filepath in db_images:
-                            continue
-                        
-                        # Extract model name from the directory structure
-                        model_dir = os.path.basename(root)
-                        model_name = model_dir.replace("_", " ")
-                        
-                        # Create a placeholder image ID
-                        image_id = f"file_{uuid.uuid4()}"
-                        
-                        # Try to extract prompt from filename (if using our naming convention)
-                        filename_parts = os.path.splitext(file)[0].split('_')
-                        if len(filename_parts) > 1:
-                            # Last part is likely the timestamp, join the rest for the prompt
-                            prompt = " ".join(filename_parts[:-1]).replace("_", " ")
-                        else:
-                            prompt = "Unknown prompt"
-                            
-                        # Get file creation time
-                        try:
-                            created_at = datetime.fromtimestamp(os.path.getctime(filepath)).strftime('%Y-%m-%d %H:%M:%S')
-                        except:
-                            created_at = "Unknown"
-                            
-                        # Add to results
-                        all_images.append((image_id, filepath, prompt, model_name, created_at))
-            
-            # Sort all images by creation time (newest first)
-            all_images.sort(key=lambda x: x[4] if x[4] != "Unknown" else "", reverse=True)
-            
-            return all_images
-            
-        except sqlite3.Error as e:
-            self.add_log(f"Database error while getting gallery images: {str(e)}")
-            return []
-        except Exception as e:
-            self.add_log(f"Error scanning image directory: {str(e)}")
-            return []
-        finally:
-            if conn:
-                conn.close()
-                
     def show_image_details(self, image_id):
         """Show details of a specific image"""
+        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = database.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -2602,19 +2598,8 @@ class ImageGeneratorApp:
             image_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 20))
             
             try:
-                # Load the image
-                pil_image = Image.open(filepath)
-                
-                # Calculate scaled size to fit window while maintaining aspect ratio
-                max_width = 700
-                max_height = 400
-                img_width, img_height = pil_image.size
-                scale = min(max_width / img_width, max_height / img_height)
-                new_width = int(img_width * scale)
-                new_height = int(img_height * scale)
-                
-                # Resize the image
-                resized_image = pil_image.resize((new_width, new_height), Image.LANCZOS)
+                # Load the image scaled to fit the window while maintaining aspect ratio
+                resized_image = open_for_display(filepath, (700, 400))
                 img = ImageTk.PhotoImage(resized_image)
                 
                 # Keep a reference to prevent garbage collection
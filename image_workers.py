@@ -0,0 +1,135 @@
+import concurrent.futures
+import multiprocessing
+import os
+from multiprocessing import resource_tracker, shared_memory
+
+from PIL import Image
+
+from display_resample import downscale
+
+
+def _export(image):
+    """Copy an image's pixels into a new shared memory block and return its description
+
+    The block is left for the receiving process to unlink. Only raw pixels travel, so
+    palette images and images with a transparent color are converted to RGB or RGBA
+    first; their palette and transparency would otherwise be lost.
+    """
+    if image.mode in ("P", "PA") or "transparency" in image.info:
+        has_alpha = image.mode == "PA" or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    data = image.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    try:
+        shm.buf[:len(data)] = data
+    finally:
+        shm.close()
+    # The receiver owns the block now; stop this process's tracker from unlinking it on exit
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm.name, image.mode, image.size, len(data)
+
+
+def _import(description, unlink):
+    """Rebuild an image from a shared memory block described by _export"""
+    name, mode, size, length = description
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = shm.buf[:length]
+        try:
+            image = Image.frombytes(mode, size, view)
+        finally:
+            view.release()
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+        else:
+            resource_tracker.unregister(shm._name, "shared_memory")
+    return image
+
+
+def _decode(filepath):
+    with Image.open(filepath) as image:
+        image.load()
+        return _export(image)
+
+
+def _thumbnail(filepath, size):
+    with Image.open(filepath) as image:
+        image.draft("RGB", size)
+        image.thumbnail(size)
+        return _export(image)
+
+
+def _resize(description, size, resample):
+    image = _import(description, unlink=False)
+    return _export(downscale(image, size, resample))
+
+
+class ImageWorkerPool:
+    """Process pool for CPU-bound image work: decoding, resizing and thumbnails
+
+    Work runs in separate processes so it scales across cores instead of competing
+    for the GIL with the Tk thread and the generation engine. Pixels travel between
+    processes through shared memory blocks rather than pickled bytes. All methods
+    block until the result is ready and are safe to call from several threads.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or os.cpu_count() or 2
+        # spawn rather than fork: forking a process that runs Tk and worker threads is unsafe
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build a pool from the "image_workers" section of settings.json, or return None
+
+        The pool is only used when "processes" is set; 0 turns it off.
+        """
+        options = settings.get('image_workers') or {}
+        processes = options.get('processes')
+        if not processes:
+            return None
+        return cls(processes=None if processes == "auto" else int(processes))
+
+    def decode(self, filepath):
+        """Decode an image file"""
+        return _import(self._executor.submit(_decode, filepath).result(), unlink=True)
+
+    def thumbnail(self, filepath, size):
+        """Decode an image file scaled down to fit within size"""
+        return _import(self._executor.submit(_thumbnail, filepath, size).result(), unlink=True)
+
+    def thumbnails(self, filepaths, size):
+        """Make thumbnails of several files in parallel
+
+        Returns a list in the order of filepaths holding an image, or the exception
+        raised for a file that could not be read.
+        """
+        futures = [self._executor.submit(_thumbnail, filepath, size) for filepath in filepaths]
+        results = []
+        for future in futures:
+            try:
+                results.append(_import(future.result(), unlink=True))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def resize(self, image, size, resample=Image.LANCZOS):
+        """Resize an image in a worker process"""
+        description = _export(image)
+        try:
+            result = self._executor.submit(_resize, description, size, resample).result()
+        finally:
+            # _export handed ownership to the receiver, which is this process again
+            shm = shared_memory.SharedMemory(name=description[0])
+            shm.close()
+            shm.unlink()
+        return _import(result, unlink=True)
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
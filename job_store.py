@@ -0,0 +1,172 @@
+import json
+import sqlite3
+import threading
+import time
+
+import database
+
+
+class JobStore:
+    """Durable record of generation jobs and their Replicate predictions
+
+    Each job is written to the generation_jobs table of the rankings database when it
+    is queued and updated as it moves through its states, with every transition kept in
+    generation_job_events. Jobs left unfinished when the app died can be found again
+    with unfinished() so the engine can re-attach to their predictions.
+    """
+
+    # States in which a job may still have work left on Replicate or on our side
+    UNFINISHED_STATES = ("queued", "running", "downloading")
+
+    # Columns that may be changed after a job was added
+    UPDATABLE_FIELDS = ("prediction_id", "version", "filepath", "error")
+
+    def __init__(self, db_path, keep_days=7):
+        self.db_path = db_path
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+        self._init_table()
+        self.prune()
+
+    def _init_table(self):
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS generation_jobs (
+                    job_key TEXT PRIMARY KEY,
+                    prompt TEXT NOT NULL,
+                    model_id TEXT NOT NULL,
+                    generation_name TEXT NOT NULL,
+                    display_name TEXT NOT NULL,
+                    input TEXT NOT NULL,
+                    variant INTEGER NOT NULL DEFAULT 0,
+                    timeout REAL NOT NULL,
+                    state TEXT NOT NULL,
+                    prediction_id TEXT,
+                    version TEXT,
+                    filepath TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_generation_jobs_state
+                ON generation_jobs (state, updated_at)
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS generation_job_events (
+                    job_key TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    recorded_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_generation_job_events_job
+                ON generation_job_events (job_key, recorded_at)
+            ''')
+            conn.commit()
+        finally:
+            if conn:
+                conn.close()
+
+    def add(self, job):
+        """Record a newly queued job"""
+        now = time.time()
+        conn = None
+        try:
+            with self._lock:
+                conn = database.connect(self.db_path)
+                conn.execute('''
+                    INSERT OR REPLACE INTO generation_jobs
+                        (job_key, prompt, model_id, generation_name, display_name, input, variant, timeout,
+                         state, prediction_id, version, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?)
+                ''', (job.key, job.prompt, job.model_id, job.generation_name, job.display_name,
+                      json.dumps(job.input, default=str), job.variant, job.timeout,
+                      job.prediction_id, job.version, now, now))
+                conn.execute(
+                    "INSERT INTO generation_job_events (job_key, state, recorded_at) VALUES (?, 'queued', ?)",
+                    (job.key, now)
+                )
+                conn.commit()
+        finally:
+            if conn:
+                conn.close()
+
+    def update(self, job_key, state=None, **fields):
+        """Change a job's state and/or fields such as its prediction ID"""
+        unknown = set(fields) - set(self.UPDATABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+
+        now = time.time()
+        columns = dict(fields, updated_at=now)
+        if state:
+            columns['state'] = state
+
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        conn = None
+        try:
+            with self._lock:
+                conn = database.connect(self.db_path)
+                conn.execute(
+                    f"UPDATE generation_jobs SET {assignments} WHERE job_key = ?",
+                    (*columns.values(), job_key)
+                )
+                if state:
+                    conn.execute(
+                        "INSERT INTO generation_job_events (job_key, state, recorded_at) VALUES (?, ?, ?)",
+                        (job_key, state, now)
+                    )
+                conn.commit()
+        finally:
+            if conn:
+                conn.close()
+
+    def unfinished(self):
+        """Return the jobs that never reached a final state, oldest first, as dicts"""
+        placeholders = ", ".join("?" for _ in self.UNFINISHED_STATES)
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(f'''
+                SELECT * FROM generation_jobs
+                WHERE state IN ({placeholders})
+                ORDER BY created_at
+            ''', self.UNFINISHED_STATES).fetchall()
+        finally:
+            if conn:
+                conn.close()
+
+        records = []
+        for row in rows:
+            record = dict(row)
+            record['input'] = json.loads(record['input'])
+            records.append(record)
+        return records
+
+    def prune(self):
+        """Forget finished jobs older than keep_days"""
+        cutoff = time.time() - self.keep_days * 24 * 3600
+        placeholders = ", ".join("?" for _ in self.UNFINISHED_STATES)
+        conn = None
+        try:
+            with self._lock:
+                conn = database.connect(self.db_path)
+                conn.execute(f'''
+                    DELETE FROM generation_job_events WHERE job_key IN (
+                        SELECT job_key FROM generation_jobs
+                        WHERE updated_at < ? AND state NOT IN ({placeholders})
+                    )
+                ''', (cutoff, *self.UNFINISHED_STATES))
+                conn.execute(f'''
+                    DELETE FROM generation_jobs
+                    WHERE updated_at < ? AND state NOT IN ({placeholders})
+                ''', (cutoff, *self.UNFINISHED_STATES))
+                conn.commit()
+        finally:
+            if conn:
+                conn.close()
@@ -0,0 +1,123 @@
+import collections
+import math
+import threading
+import time
+
+import database
+
+
+class LatencyStore:
+    """Per-model prediction latency history used to derive adaptive deadlines
+
+    Samples are kept in the generation_latency table of the rankings database and
+    the most recent max_samples per model are held in memory.
+    """
+
+    def __init__(self, db_path, max_samples=100, min_samples=5, factor=1.5, floor=10):
+        self.db_path = db_path
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self.factor = factor
+        self.floor = floor
+
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=self.max_samples))
+        self._lock = threading.Lock()
+
+        self._init_table()
+        self._load()
+
+    def _init_table(self):
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS generation_latency (
+                    model_id TEXT NOT NULL,
+                    seconds REAL NOT NULL,
+                    recorded_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_generation_latency_model
+                ON generation_latency (model_id, recorded_at)
+            ''')
+            conn.commit()
+        finally:
+            if conn:
+                conn.close()
+
+    def _load(self):
+        """Load the most recent samples for every model"""
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            rows = conn.execute('''
+                SELECT model_id, seconds FROM (
+                    SELECT model_id, seconds, recorded_at,
+                           ROW_NUMBER() OVER (PARTITION BY model_id ORDER BY recorded_at DESC) AS rn
+                    FROM generation_latency
+                )
+                WHERE rn <= ?
+                ORDER BY recorded_at
+            ''', (self.max_samples,)).fetchall()
+        finally:
+            if conn:
+                conn.close()
+
+        with self._lock:
+            for model_id, seconds in rows:
+                self._samples[model_id].append(seconds)
+
+    def record(self, model_id, seconds):
+        """Record the latency of a prediction
+
+        For a prediction that missed its deadline, record the deadline: a lower bound on
+        its latency that lets the deadline grow when a model gets slower.
+        """
+        with self._lock:
+            self._samples[model_id].append(seconds)
+
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            conn.execute(
+                "INSERT INTO generation_latency (model_id, seconds, recorded_at) VALUES (?, ?, ?)",
+                (model_id, seconds, time.time())
+            )
+            # Keep the table bounded to the samples that are still used
+            conn.execute('''
+                DELETE FROM generation_latency
+                WHERE model_id = ? AND rowid NOT IN (
+                    SELECT rowid FROM generation_latency
+                    WHERE model_id = ?
+                    ORDER BY recorded_at DESC
+                    LIMIT ?
+                )
+            ''', (model_id, model_id, self.max_samples))
+            conn.commit()
+        finally:
+            if conn:
+                conn.close()
+
+    def percentile(self, model_id, q):
+        """Return the q-th percentile (0-100) latency for a model, or None without enough history"""
+        with self._lock:
+            samples = sorted(self._samples.get(model_id, ()))
+
+        if len(samples) < self.min_samples:
+            return None
+
+        # Nearest-rank percentile
+        rank = max(1, math.ceil(q / 100 * len(samples)))
+        return samples[rank - 1]
+
+    def deadline(self, model_id, ceiling):
+        """Return the adaptive deadline for a model, never above ceiling
+
+        The deadline is p95 latency times factor, clamped to [floor, ceiling].
+        Models without enough history get the ceiling.
+        """
+        p95 = self.percentile(model_id, 95)
+        if p95 is None:
+            return ceiling
+        return min(ceiling, max(self.floor, p95 * self.factor))
@@ -0,0 +1,71 @@
+import asyncio
+
+
+class PipelineStage:
+    """One stage of the generation pipeline: a bounded queue served by a fixed number of workers
+
+    handler(job) is awaited for every job taken from the queue. When it returns, the job
+    moves on to next_stage, and the worker waits while that stage's queue is full, so a
+    slow stage holds back the ones before it instead of piling up work. The last stage
+    resolves the job's future with the job. A handler error resolves the future with
+    that error, and canceling the future cancels the running handler.
+    """
+
+    def __init__(self, name, handler, workers, maxsize, next_stage=None):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.next_stage = next_stage
+        self.queue = asyncio.Queue(maxsize)
+        self.busy = 0
+        self._worker_tasks = []
+
+    def start(self):
+        """Start the workers; call from the event loop thread"""
+        self._worker_tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def put(self, job, future):
+        """Queue a job, waiting while the queue is full"""
+        await self.queue.put((job, future))
+
+    def stats(self):
+        """Return (queued, busy) job counts"""
+        return self.queue.qsize(), self.busy
+
+    async def _work(self):
+        while True:
+            job, future = await self.queue.get()
+            try:
+                # Jobs canceled while they waited in the queue are dropped
+                if not future.done():
+                    await self._handle(job, future)
+            finally:
+                self.queue.task_done()
+
+    async def _handle(self, job, future):
+        task = asyncio.ensure_future(self.handler(job))
+        future.add_done_callback(lambda f: task.cancel() if f.cancelled() else None)
+
+        self.busy += 1
+        try:
+            await asyncio.wait([task])
+        finally:
+            self.busy -= 1
+
+        if future.done():
+            return
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        elif self.next_stage:
+            await self.next_stage.put(job, future)
+        else:
+            future.set_result(job)
@@ -0,0 +1,130 @@
+import asyncio
+import contextlib
+import re
+import time
+
+
+class TokenBucket:
+    """Async token bucket allowing a steady request rate with short bursts
+
+    A rate of None means unlimited; the bucket then only enforces pauses.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate) if rate else None
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate or 1.0))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+
+            if self.rate is None:
+                return
+
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Hand out no tokens for the next seconds, e.g. after a 429 with Retry-After"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class ConcurrencyLimiter:
+    """Per-model and per-provider limits on in-flight predictions and request rate
+
+    Limits are dicts with optional "max_in_flight" and "requests_per_second" keys.
+    Model limits are keyed by model ID, provider limits by the model ID prefix up to
+    and including the slash (e.g. "google/"). Providers without an explicit entry use
+    default_provider_limit. Must be used from a single event loop.
+    """
+
+    DEFAULT_PROVIDER_LIMIT = {"max_in_flight": 5, "requests_per_second": 5.0}
+
+    def __init__(self, model_limits=None, provider_limits=None, default_provider_limit=None):
+        self.model_limits = dict(model_limits or {})
+        self.provider_limits = dict(provider_limits or {})
+        self.default_provider_limit = dict(default_provider_limit or self.DEFAULT_PROVIDER_LIMIT)
+
+        self._semaphores = {}
+        self._buckets = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build a limiter from the "rate_limits" section of settings.json"""
+        limits = settings.get('rate_limits') or {}
+        return cls(
+            model_limits=limits.get('models'),
+            provider_limits=limits.get('providers'),
+            default_provider_limit=limits.get('default')
+        )
+
+    @staticmethod
+    def provider_of(model_id):
+        """Return the provider prefix of a model ID, e.g. "google/" for "google/imagen-3\""""
+        return model_id.split("/", 1)[0] + "/"
+
+    def _limits_for(self, model_id):
+        """Return the (key, limit) pairs that apply to a model, provider first"""
+        provider = self.provider_of(model_id)
+        pairs = [(provider, self.provider_limits.get(provider, self.default_provider_limit))]
+        if model_id in self.model_limits:
+            pairs.append((model_id, self.model_limits[model_id]))
+        return pairs
+
+    def _semaphore(self, key, limit):
+        if key not in self._semaphores:
+            self._semaphores[key] = asyncio.Semaphore(limit["max_in_flight"])
+        return self._semaphores[key]
+
+    def _bucket(self, key, limit):
+        if key not in self._buckets:
+            self._buckets[key] = TokenBucket(limit.get("requests_per_second"))
+        return self._buckets[key]
+
+    @contextlib.asynccontextmanager
+    async def slot(self, model_id):
+        """Hold an in-flight slot for the model and its provider"""
+        # Always acquire provider before model so two jobs can never deadlock
+        async with contextlib.AsyncExitStack() as stack:
+            for key, limit in self._limits_for(model_id):
+                if limit.get("max_in_flight"):
+                    await stack.enter_async_context(self._semaphore(key, limit))
+            yield
+
+    async def wait_for_rate(self, model_id):
+        """Wait until the model and its provider may send another request"""
+        for key, limit in self._limits_for(model_id):
+            await self._bucket(key, limit).acquire()
+
+    def throttle(self, model_id, retry_after):
+        """Hold back every request for a model and its provider after a rate limit response"""
+        for key, limit in self._limits_for(model_id):
+            self._bucket(key, limit).pause(retry_after)
+
+
+def parse_retry_after(message, default=1.0):
+    """Extract the wait time from a Replicate throttling error, e.g. "available in 5 seconds\""""
+    match = re.search(r"(\d+(?:\.\d+)?)\s*seconds?", message or "")
+    return float(match.group(1)) if match else default
+
+
+def is_throttled(message):
+    """Return True if a Replicate error message reports a rate limit"""
+    message = (message or "").lower()
+    return "throttled" in message or "rate limit" in message or "429" in message
@@ -0,0 +1,221 @@
+import collections
+import concurrent.futures
+import threading
+
+from PIL import ImageTk
+
+from arena_frame import ArenaFrame
+from display_resample import downscale, fit_size
+
+
+def render_display_frame(image, box, border_size=None, resize=None):
+    """Scale an image to fit within box and, for arena mode, frame it in a pixelated border
+
+    box is the (width, height) available for the image itself; the arena border is
+    drawn around it. resize(image, size) defaults to the two-stage display downscale.
+    """
+    new_width, new_height = fit_size(image.size, box)
+    resized_image = (resize or downscale)(image, (new_width, new_height))
+
+    if border_size is None:
+        return resized_image
+
+    # Arena mode: frame the image in the pixelated neon border
+    return ArenaFrame.for_border(border_size).compose(resized_image)
+
+
+class RenderCache:
+    """Shared LRU of ready-to-display carousel frames
+
+    Frames are keyed by (file path, target box, border size), where a border size of
+    None is the normal display and a number the arena-mode frame. They are rendered
+    from the previews in a PreviewCache, so the embedded carousel and the fullscreen
+    carousel share every frame either of them rendered. prefetch() renders frames in a
+    background thread before they are needed.
+
+    PhotoImages are only created and dropped on the Tk thread, in photo().
+    """
+
+    def __init__(self, previews, resize=None, max_frames=32, max_photos=8):
+        self.previews = previews
+        self.resize = resize
+        self.max_frames = max_frames
+        self.max_photos = max_photos
+
+        self._frames = collections.OrderedDict()
+        self._pending = set()
+        self._prefetch_wanted = set()
+        self._lock = threading.Lock()
+        self._photos = collections.OrderedDict()
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="render-prefetch")
+        # Frames waiting to be shown get their own thread so they never queue behind prefetches
+        self._display_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="render-display")
+
+    def frame(self, filepath, box, border_size=None):
+        """Return the rendered frame for an image, rendering it now on a miss, or None if unreadable"""
+        key = (filepath, box, border_size)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+                return frame
+
+        image = self.previews.get(filepath)
+        if image is None:
+            return None
+
+        frame = render_display_frame(image, box, border_size, self.resize)
+        with self._lock:
+            self._frames[key] = frame
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+        return frame
+
+    def photo(self, filepath, box, border_size=None):
+        """Return a PhotoImage of the rendered frame, or None if unreadable; call on the Tk thread"""
+        key = (filepath, box, border_size)
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+            return photo
+
+        frame = self.frame(filepath, box, border_size)
+        if frame is None:
+            return None
+
+        photo = ImageTk.PhotoImage(frame)
+        self._photos[key] = photo
+        while len(self._photos) > self.max_photos:
+            self._photos.popitem(last=False)
+        return photo
+
+    def cached_photo(self, filepath, box, border_size=None):
+        """Return a PhotoImage if the frame is already rendered, otherwise None; call on the Tk thread"""
+        key = (filepath, box, border_size)
+        if key not in self._photos:
+            with self._lock:
+                if key not in self._frames:
+                    return None
+        return self.photo(filepath, box, border_size)
+
+    def render(self, filepath, box, border_size=None):
+        """Render a frame on the display thread and return a Future of it (None if unreadable)"""
+        return self._display_executor.submit(self.frame, filepath, box, border_size)
+
+    def prefetch(self, filepaths, box, border_size=None):
+        """Render frames for the given images in the background
+
+        Each call replaces the previous one: frames only an earlier call asked for that
+        have not started rendering yet are dropped, so fast navigation does not pile up
+        stale work. Frames both calls want are still rendered by the earlier task.
+        """
+        keys = [(filepath, box, border_size) for filepath in filepaths]
+        with self._lock:
+            self._prefetch_wanted = set(keys)
+
+        for key in keys:
+            with self._lock:
+                if key in self._frames or key in self._pending:
+                    continue
+                self._pending.add(key)
+            self._executor.submit(self._prefetch_one, key)
+
+    def _prefetch_one(self, key):
+        try:
+            with self._lock:
+                wanted = key in self._prefetch_wanted
+            if wanted:
+                self.frame(*key)
+        except Exception:
+            # A frame that fails here is rendered, and its error shown, when it is displayed
+            pass
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def shutdown(self):
+        """Stop the render threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._display_executor.shutdown(wait=False, cancel_futures=True)
+
+
+class FrameRequest:
+    """Shows the most recently requested frame in one image display
+
+    request() is called on the Tk thread whenever the display should change. A frame
+    that is already rendered is shown at once. Otherwise the request waits delay ms so
+    a burst of key repeats or resize events can settle, and is then rendered on the
+    render cache's display thread. Requests superseded in the meantime are dropped, so
+    only the latest frame is ever rendered. show(key, photo) is called on the Tk thread
+    with the (filepath, box, border_size) key and its PhotoImage, or None if the image
+    could not be read.
+    """
+
+    def __init__(self, widget, render_cache, show, delay=40, poll_interval=10):
+        self.widget = widget
+        self.render_cache = render_cache
+        self.show = show
+        self.delay = delay
+        self.poll_interval = poll_interval
+
+        self._wanted = None  # latest key that has not been shown yet
+        self._timer = None
+        self._poll_timer = None
+        self._future = None
+        self._future_key = None
+
+    def request(self, filepath, box, border_size=None):
+        """Show the frame for an image, now if it is cached or else once it is rendered"""
+        key = (filepath, box, border_size)
+        self._cancel_timer()
+
+        photo = self.render_cache.cached_photo(*key)
+        if photo is not None:
+            self._wanted = None
+            self.show(key, photo)
+            return
+
+        self._wanted = key
+        self._timer = self.widget.after(self.delay, self._start)
+
+    def cancel(self):
+        """Drop the pending request; call before the widget is destroyed"""
+        self._wanted = None
+        self._cancel_timer()
+        if self._poll_timer is not None:
+            self.widget.after_cancel(self._poll_timer)
+            self._poll_timer = None
+        self._future = None
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self.widget.after_cancel(self._timer)
+            self._timer = None
+
+    def _start(self):
+        self._timer = None
+        # With a render in flight, _poll starts the latest request once it finishes
+        if self._wanted is None or self._future is not None:
+            return
+        self._future_key = self._wanted
+        self._future = self.render_cache.render(*self._wanted)
+        self._poll_timer = self.widget.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        self._poll_timer = None
+        if not self._future.done():
+            self._poll_timer = self.widget.after(self.poll_interval, self._poll)
+            return
+
+        future, key = self._future, self._future_key
+        self._future = None
+        if key != self._wanted:
+            # Superseded while rendering; start the latest request unless it is still settling
+            if self._timer is None:
+                self._start()
+            return
+
+        self._wanted = None
+        frame = future.result()
+        self.show(key, None if frame is None else self.render_cache.photo(*key))
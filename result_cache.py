@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import database
+
+
+class ResultCache:
+    """Content-addressed cache of generated images in the rankings database
+
+    Entries are keyed by a hash of the resolved model version, the normalized prompt,
+    the remaining model inputs and the seed, and point at the image already saved
+    under generated_images. Entries expire after ttl seconds and the least recently
+    used ones are evicted beyond max_entries. Evicting an entry never deletes the
+    image file, which still belongs to the gallery.
+    """
+
+    def __init__(self, db_path, ttl=7 * 24 * 3600, max_entries=2000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._init_table()
+
+    @classmethod
+    def from_settings(cls, db_path, settings):
+        """Build a cache from the "result_cache" section of settings.json"""
+        options = settings.get('result_cache') or {}
+        return cls(
+            db_path,
+            ttl=options.get('ttl_days', 7) * 24 * 3600,
+            max_entries=options.get('max_entries', 2000)
+        )
+
+    def _init_table(self):
+        conn = None
+        try:
+            conn = database.connect(self.db_path)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model_id TEXT NOT NULL,
+                    filepath TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_result_cache_last_used
+                ON result_cache (last_used)
+            ''')
+            conn.commit()
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def make_key(version, input, seed):
+        """Return the cache key for a model version, its input and a seed
+
+        The prompt is normalized by trimming and collapsing whitespace. When the input
+        has no explicit seed, seed stands in for it so that several images of the same
+        prompt map to distinct entries.
+        """
+        normalized = dict(input)
+        normalized['prompt'] = re.sub(r'\s+', ' ', normalized.get('prompt', '')).strip()
+        if 'seed' not in normalized:
+            normalized['seed'] = seed
+
+        payload = json.dumps({'version': version, 'input': normalized}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, cache_key):
+        """Return the cached image path for a key, or None on a miss"""
+        now = time.time()
+        conn = None
+        try:
+            with self._lock:
+                conn = database.connect(self.db_path)
+                row = conn.execute(
+                    "SELECT filepath, created_at FROM result_cache WHERE cache_key = ?",
+                    (cache_key,)
+                ).fetchone()
+                if not row:
+                    return None
+
+                filepath, created_at = row
+                # Drop entries that expired or whose image was deleted from disk
+                if now - created_at > self.ttl or not os.path.exists(filepath):
+                    conn.execute("DELETE FROM result_cache WHERE cache_key = ?", (cache_key,))
+                    conn.commit()
+                    return None
+
+                conn.execute("UPDATE result_cache SET last_used = ? WHERE cache_key = ?", (now, cache_key))
+                conn.commit()
+                return filepath
+        finally:
+            if conn:
+                conn.close()
+
+    def put(self, cache_key, model_id, filepath):
+        """Store the image generated for a key and evict old entries"""
+        now = time.time()
+        conn = None
+        try:
+            with self._lock:
+                conn = database.connect(self.db_path)
+                conn.execute('''
+                    INSERT OR REPLACE INTO result_cache (cache_key, model_id, filepath, created_at, last_used)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (cache_key, model_id, filepath, now, now))
+                self._evict(conn, now)
+                conn.commit()
+        finally:
+            if conn:
+                conn.close()
+
+    def _evict(self, conn, now):
+        """Remove expired entries and the least recently used ones beyond max_entries"""
+        conn.execute("DELETE FROM result_cache WHERE created_at < ?", (now - self.ttl,))
+        conn.execute('''
+            DELETE FROM result_cache WHERE cache_key IN (
+                SELECT cache_key FROM result_cache
+                ORDER BY last_used DESC
+                LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
@@ -0,0 +1,115 @@
+import concurrent.futures
+import glob
+import hashlib
+import os
+import threading
+
+from PIL import Image
+
+
+class ThumbnailCache:
+    """On-disk cache of gallery thumbnails
+
+    Thumbnails are small JPEG files under directory (~/.imagegenie/thumbs in the app),
+    named after the source file's path, modification time and size. A source file that
+    is changed or replaced gets a new name, so stale thumbnails are never shown, and the
+    old thumbnail of that file is deleted when the new one is written.
+
+    get() only reads thumbnails that already exist. request() makes missing ones in a
+    background thread, with the image worker pool when there is one.
+    """
+
+    def __init__(self, directory, size=(200, 200), image_workers=None, workers=None):
+        self.directory = directory
+        self.size = size
+        self.image_workers = image_workers
+        os.makedirs(directory, exist_ok=True)
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        workers = workers or (image_workers.processes if image_workers else 1)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+
+    def _path_hash(self, filepath):
+        return hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()
+
+    def _thumb_path(self, filepath):
+        """Return the thumbnail path for the current version of a file; raises OSError if it is missing"""
+        stat = os.stat(filepath)
+        path_hash = self._path_hash(filepath)
+        name = f"{path_hash}-{stat.st_mtime_ns}-{stat.st_size}-{self.size[0]}x{self.size[1]}.jpg"
+        return os.path.join(self.directory, path_hash[:2], name)
+
+    def get(self, filepath):
+        """Return the cached thumbnail of a file, or None if it has not been made yet"""
+        try:
+            thumb_path = self._thumb_path(filepath)
+            with Image.open(thumb_path) as thumb:
+                thumb.load()
+                return thumb
+        except OSError:
+            return None
+
+    def load(self, filepath):
+        """Return the thumbnail of a file, making and storing it now on a miss"""
+        thumb = self.get(filepath)
+        if thumb is None:
+            thumb = self._make(filepath)
+        return thumb
+
+    def request(self, filepath, callback):
+        """Make the thumbnail of a file in the background
+
+        callback(filepath, thumbnail) is called on the worker thread, with the exception
+        instead of a thumbnail if the file could not be read.
+        """
+        with self._lock:
+            if filepath in self._pending:
+                return
+            self._pending[filepath] = self._executor.submit(self._request_one, filepath, callback)
+
+    def cancel(self, filepath):
+        """Drop a request that has not started yet, e.g. for a cell scrolled out of view"""
+        with self._lock:
+            future = self._pending.get(filepath)
+            if future is not None and future.cancel():
+                del self._pending[filepath]
+
+    def _request_one(self, filepath, callback):
+        try:
+            thumb = self.load(filepath)
+        except Exception as e:
+            thumb = e
+        finally:
+            with self._lock:
+                self._pending.pop(filepath, None)
+        callback(filepath, thumb)
+
+    def _make(self, filepath):
+        thumb_path = self._thumb_path(filepath)
+
+        if self.image_workers:
+            thumb = self.image_workers.thumbnail(filepath, self.size)
+        else:
+            with Image.open(filepath) as image:
+                image.draft("RGB", self.size)
+                image.thumbnail(self.size)
+                thumb = image.copy()
+        if thumb.mode != "RGB":
+            thumb = thumb.convert("RGB")
+
+        # Drop the thumbnails of earlier versions of the file, then write atomically
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        for old in glob.glob(os.path.join(os.path.dirname(thumb_path), self._path_hash(filepath) + "-*")):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        temp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+        thumb.save(temp_path, "JPEG", quality=85)
+        os.replace(temp_path, thumb_path)
+        return thumb
+
+    def shutdown(self):
+        """Stop the background thread, dropping thumbnails not started yet"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,73 @@
+import collections
+import sys
+import threading
+import time
+
+
+class UIDispatcher:
+    """Batches UI mutations from any thread and applies them on the Tk thread once per frame
+
+    post() queues a callback to run in order with the others. post_coalesced() queues a
+    callback under a key, and posting the same key again before it ran replaces the
+    pending call, so a burst of carousel refreshes becomes a single refresh. Each frame
+    runs queued callbacks until frame_budget seconds are spent and leaves the rest for
+    the next frame, then runs the coalesced callbacks once the queue is empty.
+
+    Posting never calls into Tk: the dispatcher is created on the Tk thread and polls
+    its queue from there, every frame_interval ms while there is work and every
+    idle_interval ms otherwise. A worker thread calling root.after() would have to wait
+    for the Tk thread, which deadlocks if the Tk thread is waiting on that worker.
+    """
+
+    def __init__(self, root, frame_budget=0.016, frame_interval=16, idle_interval=50):
+        self.root = root
+        self.frame_budget = frame_budget
+        self.frame_interval = frame_interval
+        self.idle_interval = idle_interval
+
+        self._pending = collections.deque()
+        self._coalesced = {}
+        self._lock = threading.Lock()
+
+        self.root.after(self.idle_interval, self._run_frame)
+
+    def post(self, callback, *args):
+        """Run callback(*args) on the Tk thread in a coming frame"""
+        with self._lock:
+            self._pending.append((callback, args))
+
+    def post_coalesced(self, key, callback, *args):
+        """Run callback(*args) once on the Tk thread, replacing a pending call with the same key"""
+        with self._lock:
+            self._coalesced[key] = (callback, args)
+
+    def _run_frame(self):
+        deadline = time.monotonic() + self.frame_budget
+
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._pending:
+                    break
+                callback, args = self._pending.popleft()
+            self._call(callback, args)
+
+        # Coalesced callbacks (refreshes) run after all queued mutations have been applied
+        with self._lock:
+            if self._pending:
+                coalesced = {}
+            else:
+                coalesced, self._coalesced = self._coalesced, {}
+
+        for callback, args in coalesced.values():
+            self._call(callback, args)
+
+        with self._lock:
+            busy = bool(self._pending or self._coalesced)
+        self.root.after(self.frame_interval if busy else self.idle_interval, self._run_frame)
+
+    def _call(self, callback, args):
+        try:
+            callback(*args)
+        except Exception:
+            # Report like any other Tk callback error without dropping the rest of the frame
+            self.root.report_callback_exception(*sys.exc_info())